@@ -28,3 +28,39 @@ STRING = getenv("STRING", None)
 YT_COOKIES = getenv("YT_COOKIES", YTUB_COOKIES)
 DEFAULT_SESSION = getenv("DEFAUL_SESSION", None)  # added old method of invite link joining
 INSTA_COOKIES = getenv("INSTA_COOKIES", INST_COOKIES)
+
+# Transfer tuning
+RELAY_MODE = getenv("RELAY_MODE", "False").lower() == "true"  # stream userbot downloads straight into uploads
+RELAY_BUFFER_MB = int(getenv("RELAY_BUFFER_MB", "8"))
+DOWNLOAD_CONNECTIONS = int(getenv("DOWNLOAD_CONNECTIONS", "4"))  # parallel media connections per download
+PARALLEL_DOWNLOAD_MIN_MB = int(getenv("PARALLEL_DOWNLOAD_MIN_MB", "20"))
+DOWNLOAD_RETRIES = int(getenv("DOWNLOAD_RETRIES", "3"))  # resumed attempts of a large download before giving up on it
+PARTIAL_MAX_AGE_HOURS = float(getenv("PARTIAL_MAX_AGE_HOURS", "24"))  # interrupted downloads older than this are deleted
+SCRATCH_QUOTA_MB = int(getenv("SCRATCH_QUOTA_MB", "0"))  # max MB reserved by running downloads, 0 = free disk only
+DISK_HEADROOM_MB = int(getenv("DISK_HEADROOM_MB", "512"))  # disk space always left free
+DISK_WAIT_MINUTES = int(getenv("DISK_WAIT_MINUTES", "30"))  # give up on a download still waiting for space, 0 = never
+FREE_BATCH_CONCURRENCY = int(getenv("FREE_BATCH_CONCURRENCY", "1"))  # parallel /batch items per free user
+PREMIUM_BATCH_CONCURRENCY = int(getenv("PREMIUM_BATCH_CONCURRENCY", "3"))
+BATCH_ITEM_DELAY = float(getenv("BATCH_ITEM_DELAY", "2"))  # base pause between items, grows on FloodWait
+SPLIT_UPLOAD_WORKERS = int(getenv("SPLIT_UPLOAD_WORKERS", "2"))  # parts of a >2GB file uploaded at once
+BOT_MAX_TRANSFERS = int(getenv("BOT_MAX_TRANSFERS", "4"))  # concurrent uploads/downloads of the bot client
+USERBOT_POOL_SIZE = int(getenv("USERBOT_POOL_SIZE", "50"))  # max logged-in user clients kept connected
+USERBOT_IDLE_TIMEOUT = int(getenv("USERBOT_IDLE_TIMEOUT", "900"))  # seconds before an unused client is stopped
+USERBOT_NEGATIVE_TTL = int(getenv("USERBOT_NEGATIVE_TTL", "300"))  # seconds a failed session is not retried
+USER_CACHE_SIZE = int(getenv("USER_CACHE_SIZE", "10000"))  # user settings records kept in memory
+USER_CACHE_TTL = int(getenv("USER_CACHE_TTL", "600"))  # seconds before cached settings are re-read
+PREMIUM_RESYNC_INTERVAL = int(getenv("PREMIUM_RESYNC_INTERVAL", "300"))  # premium list reload period without a replica set
+PROGRESS_INTERVAL = float(getenv("PROGRESS_INTERVAL", "5"))  # min seconds between edits of one status message
+PROGRESS_EDITS_PER_SECOND = float(getenv("PROGRESS_EDITS_PER_SECOND", "10"))  # progress edits per second across all users
+RPC_CLIENT_RATE = float(getenv("RPC_CLIENT_RATE", "30"))  # API calls per second per client before queueing
+RPC_PEER_RATE = float(getenv("RPC_PEER_RATE", "1"))  # sends/edits per second into one chat (burst of 5)
+FLOOD_MAX_WAIT = int(getenv("FLOOD_MAX_WAIT", "300"))  # longer FloodWaits are raised instead of queued
+PROBE_TIMEOUT = float(getenv("PROBE_TIMEOUT", "15"))  # seconds before an ffprobe run is abandoned
+THUMB_CACHE_DIR = getenv("THUMB_CACHE_DIR", "thumbs")  # directory for cached video thumbnails
+THUMB_CACHE_MB = int(getenv("THUMB_CACHE_MB", "200"))  # size cap of the thumbnail cache
+THUMB_WORKERS = int(getenv("THUMB_WORKERS", "2"))  # ffmpeg thumbnail runs at a time
+WORKER_ID = getenv("WORKER_ID", "main")  # name this process uses to hold batch job leases
+JOB_LEASE_SECONDS = int(getenv("JOB_LEASE_SECONDS", "120"))  # a batch job is taken over if its lease is not renewed in time
+WORKER_MODE = getenv("WORKER_MODE", "all").lower()  # all, frontend (takes updates, queues jobs) or worker (runs queued jobs)
+WORKER_MAX_JOBS = int(getenv("WORKER_MAX_JOBS", "4"))  # jobs a worker process runs at once
+JOB_POLL_INTERVAL = float(getenv("JOB_POLL_INTERVAL", "2"))  # seconds between queue polls when a worker is idle
@@ -17,9 +17,11 @@ import logging
 import time
 from pyrogram import Client
 from pyrogram.enums import ParseMode 
-from config import API_ID, API_HASH, BOT_TOKEN, STRING, MONGO_DB, DEFAULT_SESSION
+from config import API_ID, API_HASH, BOT_TOKEN, STRING, MONGO_DB, DEFAULT_SESSION, DOWNLOAD_CONNECTIONS, BOT_MAX_TRANSFERS, WORKER_MODE, WORKER_ID
 from telethon.sync import TelegramClient
 from motor.motor_asyncio import AsyncIOMotorClient
+from devgagan.core.ratelimit import rate_limiter, install_pyrogram, install_telethon
+from devgagan.core.mongo.flood_db import create_flood_index
 
 loop = asyncio.new_event_loop()
 asyncio.set_event_loop(loop)
@@ -31,29 +33,44 @@ logging.basicConfig(
 
 botStartTime = time.time()
 
+# Worker processes only run queued jobs: they take no updates and need session files of their own
+IS_WORKER = WORKER_MODE == "worker"
+
+
+def session_name(name):
+    return f"{name}_{WORKER_ID}" if IS_WORKER else name
+
+
 app = Client(
-    "pyrobot",
+    session_name("pyrobot"),
     api_id=API_ID,
     api_hash=API_HASH,
     bot_token=BOT_TOKEN,
     workers=50,
-    parse_mode=ParseMode.MARKDOWN
+    parse_mode=ParseMode.MARKDOWN,
+    max_concurrent_transmissions=BOT_MAX_TRANSFERS,
+    no_updates=IS_WORKER
 )
+install_pyrogram(app, "app")
 
-sex = TelegramClient('sexrepo', API_ID, API_HASH).start(bot_token=BOT_TOKEN)
+sex = TelegramClient(session_name('sexrepo'), API_ID, API_HASH, receive_updates=not IS_WORKER).start(bot_token=BOT_TOKEN)
+install_telethon(sex, "sex")
 
 if STRING:
-    pro = Client("ggbot", api_id=API_ID, api_hash=API_HASH, session_string=STRING)
+    pro = Client(session_name("ggbot"), api_id=API_ID, api_hash=API_HASH, session_string=STRING, no_updates=IS_WORKER)
+    install_pyrogram(pro, "pro")
 else:
     pro = None
 
 
 if DEFAULT_SESSION:
-    userrbot = Client("userrbot", api_id=API_ID, api_hash=API_HASH, session_string=DEFAULT_SESSION)
+    userrbot = Client(session_name("userrbot"), api_id=API_ID, api_hash=API_HASH, session_string=DEFAULT_SESSION, max_concurrent_transmissions=DOWNLOAD_CONNECTIONS, no_updates=IS_WORKER)
+    install_pyrogram(userrbot, "userrbot")
 else:
     userrbot = None
 
-telethon_client = TelegramClient('telethon_session', API_ID, API_HASH).start(bot_token=BOT_TOKEN)
+telethon_client = TelegramClient(session_name('telethon_session'), API_ID, API_HASH, receive_updates=not IS_WORKER).start(bot_token=BOT_TOKEN)
+install_telethon(telethon_client, "telethon")
 
 # MongoDB setup
 tclient = AsyncIOMotorClient(MONGO_DB)
@@ -67,6 +84,8 @@ async def create_ttl_index():
 # Run the TTL index creation when the bot starts
 async def setup_database():
     await create_ttl_index()
+    await create_flood_index()
+    await rate_limiter.load()
     print("MongoDB TTL index created.")
 
 async def restrict_bot():
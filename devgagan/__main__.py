@@ -2,24 +2,21 @@
 
 import asyncio
 import importlib
-import gc
 from pyrogram import idle
 from devgagan.modules import ALL_MODULES
-from devgagan.core.mongo.plans_db import check_and_remove_expired_users
-from aiojobs import create_scheduler
+from devgagan.core.mongo.plans_db import create_premium_index, load_premium_index, run_expiry_scheduler, sync_premium_index
+from devgagan.core.mongo.cache_db import create_cache_index
+from devgagan.core.mongo.users_db import create_user_index, load_seen_users
+from devgagan.core.mongo.jobs_db import create_job_index
+from devgagan.core.get_func import telegram_bot
+from devgagan.core.fast_download import run_partial_gc
+from devgagan.modules.plans import notify_expired_users
+from devgagan.modules.main import resume_batch_jobs, run_job_worker
 
 # ----------------------------Bot-Start---------------------------- #
 
 loop = asyncio.get_event_loop()
 
-# Function to schedule expiry checks
-async def schedule_expiry_check():
-    scheduler = await create_scheduler()
-    while True:
-        await scheduler.spawn(check_and_remove_expired_users())
-        await asyncio.sleep(60)  # Check every hour
-        gc.collect()
-
 async def devggn_boot():
     for all_module in ALL_MODULES:
         importlib.import_module("devgagan.modules." + all_module)
@@ -40,7 +37,7 @@ async def devggn_boot():
 """)
     
     # Verify LOG_GROUP access
-    from config import LOG_GROUP
+    from config import LOG_GROUP, PARTIAL_MAX_AGE_HOURS, WORKER_MODE, WORKER_ID
     from devgagan import app
     try:
         chat = await app.get_chat(LOG_GROUP)
@@ -50,8 +47,25 @@ async def devggn_boot():
         print(f"   Error: {e}")
         print(f"   Please add bot to the channel/group with posting rights!")
 
-    asyncio.create_task(schedule_expiry_check())
-    print("Auto removal started ...")
+    await create_cache_index()
+    await create_user_index()
+    await load_seen_users()
+    await create_premium_index()
+    await load_premium_index()
+    await create_job_index()
+    asyncio.create_task(sync_premium_index())
+    asyncio.create_task(telegram_bot.db.watch_changes())
+    if WORKER_MODE != "worker":
+        # Expiry notices are sent once, by the process that talks to users
+        asyncio.create_task(run_expiry_scheduler(notify_expired_users))
+        print("Auto removal started ...")
+    if WORKER_MODE == "worker":
+        asyncio.create_task(run_job_worker())
+        print(f"Worker {WORKER_ID} is taking jobs from the queue ...")
+    elif WORKER_MODE == "all":
+        asyncio.create_task(resume_batch_jobs())
+    if WORKER_MODE != "frontend":
+        asyncio.create_task(run_partial_gc(PARTIAL_MAX_AGE_HOURS * 3600))
     await idle()
     print("Bot stopped...")
 
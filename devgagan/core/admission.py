@@ -0,0 +1,165 @@
+# ---------------------------------------------------
+# File Name: admission.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import os
+import shutil
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+from devgagan.core.fast_download import idle_partial_bytes
+from config import SCRATCH_QUOTA_MB, DISK_HEADROOM_MB, DISK_WAIT_MINUTES
+
+
+class Reservation:
+    def __init__(self, controller: "DiskAdmission", size: int, path: Optional[str] = None):
+        self.controller = controller
+        self.size = size
+        self.released = False
+        self.paths: List[str] = [path] if path else []
+
+    def track(self, path: str):
+        """Count what is already written to `path` as used, so it is not subtracted from free space twice"""
+        self.paths.append(path)
+
+    def unwritten(self) -> int:
+        written = 0
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # Partials are preallocated sparse files, so count the blocks actually written
+            written += stat.st_blocks * 512 if hasattr(stat, "st_blocks") else stat.st_size
+        return max(0, self.size - written)
+
+    def release(self):
+        """Give the space back; safe to call more than once"""
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+
+class DiskAdmission:
+    """Reserves scratch space for a download before it starts.
+
+    A download is admitted when its size fits both the quota (if one is set) and the free disk
+    space minus the not yet written part of every outstanding reservation and `headroom`.
+    Partial downloads kept for a later resume count against the quota too. Downloads that do
+    not fit wait in FIFO order until earlier ones release their space, or until space freed
+    some other way is noticed by a recheck every `poll_interval` seconds; one that could never
+    fit, even on an idle disk, is refused right away, and one still waiting after
+    `wait_timeout` seconds gives up.
+    """
+    def __init__(self, path: str = "downloads", quota: int = 0, headroom: int = 512 * 1024 * 1024,
+                 wait_timeout: Optional[float] = None, poll_interval: float = 5.0):
+        self.path = path
+        self.quota = quota
+        self.headroom = headroom
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.reserved = 0
+        self.active = 0
+        self._reservations: Set[Reservation] = set()
+        self._waiters: Deque[Tuple[int, Optional[str], asyncio.Future]] = deque()
+        self._poller: Optional[asyncio.Task] = None
+
+    def _free_disk(self) -> int:
+        os.makedirs(self.path, exist_ok=True)
+        return shutil.disk_usage(self.path).free
+
+    def _fits(self, size: int, partial: Optional[str] = None) -> bool:
+        if self.quota and self.reserved + idle_partial_bytes(partial) + size > self.quota:
+            return False
+        # Bytes a reserved download has already written are gone from the free space; only the rest is still to come
+        pending = sum(reservation.unwritten() for reservation in self._reservations)
+        return size <= self._free_disk() - pending - self.headroom
+
+    async def acquire(self, size: int, on_wait: Optional[Callable[[], Awaitable[None]]] = None,
+                      partial: Optional[str] = None) -> Reservation:
+        """Wait until `size` bytes may be written; raises OSError if they never could be or the wait times out.
+
+        `partial` is the download's own partial file, already covered by `size`.
+        """
+        size = max(0, size or 0)
+        if not self._waiters and self._fits(size, partial):
+            return self._grant(size, partial)
+        # Other files on the disk may still go away, but the disk itself can never hold more than this
+        if (self.quota and size > self.quota) or size > shutil.disk_usage(self.path).total - self.headroom:
+            raise OSError(f"Not enough disk space for a {size / 1024**2:.0f} MB file")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((size, partial, waiter))
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+        if on_wait:
+            try:
+                await on_wait()
+            except Exception:
+                pass
+        try:
+            await asyncio.wait({waiter}, timeout=self.wait_timeout)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as we were cancelled; hand the space straight back
+                waiter.result().release()
+            else:
+                self._remove_waiter(waiter)
+            raise
+        if not waiter.done():
+            self._remove_waiter(waiter)
+            raise OSError(f"Timed out waiting for disk space for a {size / 1024**2:.0f} MB file")
+        return waiter.result()
+
+    def _grant(self, size: int, partial: Optional[str] = None) -> Reservation:
+        self.reserved += size
+        self.active += 1
+        reservation = Reservation(self, size, partial)
+        self._reservations.add(reservation)
+        return reservation
+
+    def _remove_waiter(self, waiter: asyncio.Future):
+        self._waiters = deque(item for item in self._waiters if item[2] is not waiter)
+        self._wake()
+
+    def _release(self, reservation: Reservation):
+        self._reservations.discard(reservation)
+        self.reserved -= reservation.size
+        self.active -= 1
+        self._wake()
+
+    async def _poll(self):
+        # Space can also come back without a release (partial cleanup, files removed by hand)
+        while self._waiters:
+            await asyncio.sleep(self.poll_interval)
+            self._wake()
+
+    def _wake(self):
+        # Strict FIFO, so a large file is not starved by a stream of small ones
+        while self._waiters and self._fits(self._waiters[0][0], self._waiters[0][1]):
+            size, partial, waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(self._grant(size, partial))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "free": self._free_disk(),
+            "reserved": self.reserved,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "quota": self.quota
+        }
+
+
+disk_admission = DiskAdmission("downloads", SCRATCH_QUOTA_MB * 1024 * 1024, DISK_HEADROOM_MB * 1024 * 1024,
+                               DISK_WAIT_MINUTES * 60 or None)
@@ -0,0 +1,199 @@
+# ---------------------------------------------------
+# File Name: batch.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Iterable, Optional, Tuple
+from pyrogram.errors import FloodWait
+
+
+class ItemCancelled(Exception):
+    """Raised from `on_item_delivering` to drop an item before it delivers anything"""
+
+
+class OrderedGate:
+    """Lets concurrent workers deliver their results strictly in sequence order"""
+    def __init__(self, first: int = 0):
+        self._next = first
+        self._done = set()
+        self._admit_next = first
+        self._admitted = set()
+        self._cond = asyncio.Condition()
+
+    def turn(self, seq: int, on_enter: Optional[Callable[[], Awaitable[None]]] = None) -> "_Turn":
+        """Async context manager that waits until every earlier sequence is completed"""
+        return _Turn(self, seq, on_enter)
+
+    async def wait_for(self, seq: int):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._next >= seq)
+
+    async def wait_admission(self, seq: int):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._admit_next >= seq)
+
+    async def admitted(self, seq: int):
+        """Mark `seq` as holding (or no longer needing) its disk reservation"""
+        async with self._cond:
+            self._admit(seq)
+            self._cond.notify_all()
+
+    def _admit(self, seq: int):
+        if seq >= self._admit_next:
+            self._admitted.add(seq)
+        while self._admit_next in self._admitted:
+            self._admitted.discard(self._admit_next)
+            self._admit_next += 1
+
+    async def complete(self, seq: int):
+        """Mark `seq` finished (delivered, skipped or failed) and wake the next in line"""
+        async with self._cond:
+            self._done.add(seq)
+            while self._next in self._done:
+                self._done.discard(self._next)
+                self._next += 1
+            self._admit(seq)
+            self._cond.notify_all()
+
+
+class _Turn:
+    """Re-enterable handle; the executor completes the sequence once the item is finished.
+
+    `on_enter` is awaited the first time the turn is entered, i.e. right before the item
+    starts delivering anything.
+    """
+    def __init__(self, gate: OrderedGate, seq: int, on_enter: Optional[Callable[[], Awaitable[None]]] = None):
+        self.gate = gate
+        self.seq = seq
+        self.on_enter = on_enter
+
+    async def __aenter__(self):
+        await self.gate.wait_for(self.seq)
+        if self.on_enter:
+            on_enter, self.on_enter = self.on_enter, None
+            await on_enter()
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def admit(self, acquire: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `acquire()` (a disk reservation) only once every earlier item holds or no longer needs one.
+
+        Items waiting for their turn keep their space, so reserving out of order could fill the
+        disk with later items while the one they all wait for is queued behind them.
+        """
+        await self.gate.wait_admission(self.seq)
+        try:
+            return await acquire()
+        finally:
+            await self.gate.admitted(self.seq)
+
+
+class FloodPacer:
+    """Adaptive delay between batch items that learns from FloodWait instead of sleeping a fixed time"""
+    def __init__(self, base_delay: float = 2.0, max_delay: float = 60.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.delay = base_delay
+        self.blocked_until = 0.0
+
+    async def wait(self):
+        pause = max(self.blocked_until - time.monotonic(), 0) + self.delay
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+    def flood(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.delay = min(self.max_delay, max(self.delay * 2, self.base_delay, 1.0))
+
+    def success(self):
+        self.delay = max(self.base_delay, self.delay * 0.75)
+
+
+class BatchExecutor:
+    """Runs batch items on a bounded worker pool while keeping delivery order"""
+    def __init__(self, process: Callable[[int, Any, _Turn], Awaitable[None]], concurrency: int = 1,
+                 is_active: Callable[[], bool] = lambda: True,
+                 on_item_done: Optional[Callable[[int], Awaitable[None]]] = None,
+                 on_item_failed: Optional[Callable[[int], Awaitable[None]]] = None,
+                 on_item_delivering: Optional[Callable[[int], Awaitable[None]]] = None,
+                 pacer: Optional[FloodPacer] = None, max_retries: int = 3):
+        self.process = process
+        self.concurrency = max(1, concurrency)
+        self.is_active = is_active
+        self.on_item_done = on_item_done
+        self.on_item_failed = on_item_failed
+        self.on_item_delivering = on_item_delivering
+        self.pacer = pacer or FloodPacer()
+        self.max_retries = max_retries
+
+    async def run(self, items: Iterable[Tuple[int, Any]], first_seq: int = 0) -> int:
+        """Process `(seq, payload)` pairs with consecutive seqs; returns the number of finished items"""
+        gate = OrderedGate(first_seq)
+        queue: asyncio.Queue = asyncio.Queue(self.concurrency * 2)
+        finished = 0
+
+        async def worker():
+            nonlocal finished
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                seq, payload = item
+                try:
+                    if self.is_active():
+                        on_enter = (lambda: self.on_item_delivering(seq)) if self.on_item_delivering else None
+                        await self._run_item(seq, payload, gate.turn(seq, on_enter))
+                        finished += 1
+                        if self.on_item_done:
+                            await self.on_item_done(seq)
+                except ItemCancelled:
+                    # The job was stopped; the item is neither done nor failed
+                    pass
+                except Exception as e:
+                    print(f"Batch item {seq} failed: {e}")
+                    if self.on_item_failed:
+                        try:
+                            await self.on_item_failed(seq)
+                        except Exception as e:
+                            print(f"Batch item {seq} failure hook failed: {e}")
+                finally:
+                    await gate.complete(seq)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            for item in items:
+                if not self.is_active():
+                    break
+                await queue.put(item)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        return finished
+
+    async def _run_item(self, seq: int, payload: Any, turn: _Turn):
+        for attempt in range(self.max_retries + 1):
+            await self.pacer.wait()
+            try:
+                await self.process(seq, payload, turn)
+                self.pacer.success()
+                return
+            except FloodWait as fw:
+                self.pacer.flood(fw.value)
+                if attempt == self.max_retries:
+                    raise
@@ -0,0 +1,77 @@
+# ---------------------------------------------------
+# File Name: cache.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class UserCache:
+    """Bounded per-user record cache with a TTL and least-recently-used eviction.
+
+    One record holds every cached field of a user, so invalidating a user is a single
+    dict pop instead of a scan over all keys.
+    """
+    def __init__(self, max_entries: int = 10000, ttl: float = 600):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._records: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: Hashable) -> Optional[Dict[str, Any]]:
+        entry = self._records.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, record = entry
+        if expires <= time.monotonic():
+            del self._records[user_id]
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._records.move_to_end(user_id)
+        self.hits += 1
+        return record
+
+    def set(self, user_id: Hashable, record: Dict[str, Any]):
+        self._records[user_id] = (time.monotonic() + self.ttl, record)
+        self._records.move_to_end(user_id)
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+            self.evictions += 1
+
+    def update(self, user_id: Hashable, key: str, value: Any):
+        """Write through a single field; users that are not cached stay uncached"""
+        entry = self._records.get(user_id)
+        if entry is not None:
+            entry[1][key] = value
+
+    def invalidate(self, user_id: Hashable):
+        if self._records.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._records.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._records),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,216 @@
+# ---------------------------------------------------
+# File Name: fast_download.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import inspect
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional, Callable
+import aiofiles
+
+CHUNK_SIZE = 1024 * 1024  # pyrogram streams media in 1 MiB chunks
+DOWNLOAD_DIR = "downloads"
+PARTIAL_SUFFIX = ".part"
+MANIFEST_EVERY = 16  # chunks between manifest writes; at most this much is refetched after a crash
+
+# Partial files being written right now, with the number of downloads waiting on each
+_active: Dict[str, List] = {}
+
+
+def _unique_id(msg) -> Optional[str]:
+    for attr in ("document", "video", "audio", "photo", "animation", "voice", "video_note"):
+        media = getattr(msg, attr, None)
+        if media:
+            return getattr(media, "file_unique_id", None)
+    return None
+
+
+def partial_paths(msg, file_name: str):
+    """Where the partial file and its manifest for this media live"""
+    key = _unique_id(msg) or os.path.basename(file_name)
+    part_path = os.path.abspath(os.path.join(DOWNLOAD_DIR, key + PARTIAL_SUFFIX))
+    return part_path, part_path + ".json"
+
+
+def idle_partial_bytes(exclude: Optional[str] = None) -> int:
+    """Disk space held by partial files kept for a later resume, other than `exclude`"""
+    if not os.path.isdir(DOWNLOAD_DIR):
+        return 0
+    total = 0
+    for entry in os.scandir(DOWNLOAD_DIR):
+        if not entry.name.endswith(PARTIAL_SUFFIX):
+            continue
+        path = os.path.abspath(entry.path)
+        if path in _active or path == exclude:
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        # Partials are preallocated sparse files, so count the blocks actually written
+        total += stat.st_blocks * 512 if hasattr(stat, "st_blocks") else stat.st_size
+    return total
+
+
+def _load_manifest(manifest_path: str, part_path: str, file_size: int) -> Optional[dict]:
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (manifest.get("file_size") != file_size or manifest.get("chunk_size") != CHUNK_SIZE
+            or not os.path.exists(part_path) or os.path.getsize(part_path) != file_size):
+        return None
+    return manifest
+
+
+def _save_manifest(manifest_path: str, manifest: dict):
+    tmp = manifest_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, manifest_path)
+
+
+async def fast_download(client, msg, file_name: str, file_size: int, connections: int = 4,
+                        progress: Optional[Callable] = None, progress_args: tuple = ()) -> str:
+    """Download media over several parallel media-DC connections into a preallocated file.
+
+    Every connection streams its own contiguous byte range (`stream_media` opens a fresh
+    media session per call), so the client must be created with
+    `max_concurrent_transmissions >= connections` for the ranges to really run in parallel.
+    A partial resumed with fewer connections than it was started with fetches its ranges
+    `connections` at a time.
+
+    Bytes go to `<file_unique_id>.part` next to a JSON manifest recording how far each range
+    got. If the download is interrupted both are kept, and the next call for the same media
+    continues every range from its last recorded chunk instead of starting over.
+    """
+    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+    file_path = os.path.abspath(os.path.join(DOWNLOAD_DIR, os.path.basename(file_name)))
+    part_path, manifest_path = partial_paths(msg, file_name)
+
+    # Two users fetching the same media would write the same partial; the second one waits
+    entry = _active.setdefault(part_path, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            return await _download(client, msg, file_path, part_path, manifest_path, file_size,
+                                   connections, progress, progress_args)
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            _active.pop(part_path, None)
+
+
+async def _download(client, msg, file_path: str, part_path: str, manifest_path: str, file_size: int,
+                    connections: int, progress: Optional[Callable], progress_args: tuple) -> str:
+    manifest = _load_manifest(manifest_path, part_path, file_size)
+    if manifest is None:
+        total_chunks = int(math.ceil(file_size / CHUNK_SIZE))
+        connections = max(1, min(connections, total_chunks))
+        per_worker = int(math.ceil(total_chunks / connections))
+        async with aiofiles.open(part_path, mode="wb") as f:
+            await f.truncate(file_size)
+        manifest = {
+            "chat_id": msg.chat.id,
+            "msg_id": msg.id,
+            "file_unique_id": _unique_id(msg),
+            "file_size": file_size,
+            "chunk_size": CHUNK_SIZE,
+            # [first chunk, next chunk to fetch, end chunk) per connection
+            "ranges": [[start, start, min(start + per_worker, total_chunks)]
+                       for start in range(0, total_chunks, per_worker)]
+        }
+        _save_manifest(manifest_path, manifest)
+    else:
+        print(f"Resuming download of {os.path.basename(file_path)} from the partial file")
+
+    ranges = manifest["ranges"]
+    done = sum(min(next_chunk * CHUNK_SIZE, file_size) - first * CHUNK_SIZE for first, next_chunk, _ in ranges)
+
+    slots = asyncio.Semaphore(connections)
+
+    async def worker(span: list):
+        nonlocal done
+        if span[1] >= span[2]:
+            return
+        # Unbuffered, so every chunk counted in the manifest has reached the OS
+        async with slots, aiofiles.open(part_path, mode="r+b", buffering=0) as f:
+            await f.seek(span[1] * CHUNK_SIZE)
+            async for chunk in client.stream_media(msg, offset=span[1], limit=span[2] - span[1]):
+                await f.write(chunk)
+                span[1] += 1
+                done += len(chunk)
+                if span[1] % MANIFEST_EVERY == 0:
+                    _save_manifest(manifest_path, manifest)
+                if progress:
+                    result = progress(min(done, file_size), file_size, *progress_args)
+                    if inspect.isawaitable(result):
+                        await result
+
+    tasks = [asyncio.create_task(worker(span)) for span in ranges]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Keep what was fetched; the next attempt only asks for the missing chunks
+        _save_manifest(manifest_path, manifest)
+        raise
+
+    if any(next_chunk < end for _, next_chunk, end in ranges) or done != file_size:
+        _save_manifest(manifest_path, manifest)
+        raise ValueError(f"Parallel download incomplete: {done}/{file_size} bytes")
+    os.replace(part_path, file_path)
+    os.remove(manifest_path)
+    return file_path
+
+
+def gc_partials(max_age: float) -> int:
+    """Delete partial downloads nobody has touched for `max_age` seconds; returns how many"""
+    if not os.path.isdir(DOWNLOAD_DIR):
+        return 0
+    removed = 0
+    cutoff = time.time() - max_age
+    for entry in os.scandir(DOWNLOAD_DIR):
+        name = entry.name
+        for suffix in (".json.tmp", ".json"):
+            if name.endswith(PARTIAL_SUFFIX + suffix):
+                name = name[:-len(suffix)]
+        if not name.endswith(PARTIAL_SUFFIX):
+            continue
+        part_path = os.path.abspath(os.path.join(DOWNLOAD_DIR, name))
+        if part_path in _active:
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+async def run_partial_gc(max_age: float, interval: float = 3600):
+    while True:
+        try:
+            removed = await asyncio.to_thread(gc_partials, max_age)
+            if removed:
+                print(f"Removed {removed} stale partial download files")
+        except Exception as e:
+            print(f"Partial download cleanup failed: {e}")
+        await asyncio.sleep(interval)
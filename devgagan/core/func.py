@@ -15,36 +15,72 @@
 import math
 import time , re
 from pyrogram import enums
+from pyrogram.enums import ChatMemberStatus
 from config import CHANNEL_ID, OWNER_ID 
-from devgagan.core.mongo.plans_db import premium_users
+from devgagan.core.mongo.plans_db import is_premium
+from devgagan.core.progress import progress_hub
+from devgagan.core.probe import media_probe
+from devgagan.core.thumbnails import thumbnail_service
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-import cv2
 from pyrogram.errors import FloodWait, InviteHashInvalid, InviteHashExpired, UserAlreadyParticipant, UserNotParticipant
-from datetime import datetime as dt
 import asyncio, subprocess, re, os, time
 async def chk_user(message, user_id):
-    user = await premium_users()
-    if user_id in user or user_id in OWNER_ID:
+    if user_id in OWNER_ID or await is_premium(user_id):
         return 0
     else:
         return 1
+# Force-subscribe caches: one invite link per channel, and membership per user for a while.
+# Members are rechecked rarely, non-members soon so joining takes effect quickly;
+# chat member updates for the channel drop entries right away (see start.py).
+# Users join through the link in their own app, so a revoked link is never reported back
+# to the bot; it is refetched after INVITE_LINK_TTL instead.
+MEMBER_CACHE_TTL = 3600
+NON_MEMBER_CACHE_TTL = 30
+INVITE_LINK_TTL = 3600
+_invite_links = {}
+_membership = {}
+
 async def gen_link(app,chat_id):
-   link = await app.export_chat_invite_link(chat_id)
+   cached = _invite_links.get(chat_id)
+   if cached and cached[0] > time.monotonic():
+      return cached[1]
+   # Reuse the channel's primary link; exporting creates a new link on every call
+   link = (await app.get_chat(chat_id)).invite_link or await app.export_chat_invite_link(chat_id)
+   _invite_links[chat_id] = (time.monotonic() + INVITE_LINK_TTL, link)
    return link
 
+def invalidate_membership(user_id):
+   _membership.pop(user_id, None)
+
+async def _member_status(app, chat_id, user_id):
+   cached = _membership.get(user_id)
+   if cached and cached[0] > time.monotonic():
+      return cached[1]
+   try:
+      status = (await app.get_chat_member(chat_id, user_id)).status
+   except UserNotParticipant:
+      status = ChatMemberStatus.LEFT
+   joined = status not in (ChatMemberStatus.LEFT, ChatMemberStatus.BANNED)
+   if len(_membership) > 100000:
+      now = time.monotonic()
+      for key in [key for key, value in _membership.items() if value[0] <= now]:
+         del _membership[key]
+   _membership[user_id] = (time.monotonic() + (MEMBER_CACHE_TTL if joined else NON_MEMBER_CACHE_TTL), status)
+   return status
+
 async def subscribe(app, message):
    update_channel = CHANNEL_ID
-   url = await gen_link(app, update_channel)
    if update_channel:
       try:
-         user = await app.get_chat_member(update_channel, message.from_user.id)
-         if user.status == "kicked":
+         status = await _member_status(app, update_channel, message.from_user.id)
+         if status == ChatMemberStatus.BANNED:
             await message.reply_text("You are Banned. Contact -- @devgaganin")
             return 1
-      except UserNotParticipant:
-        caption = f"Join our channel to use the bot"
-        await message.reply_photo(photo="https://graph.org/file/d44f024a08ded19452152.jpg",caption=caption, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("Join Now...", url=f"{url}")]]))
-        return 1
+         if status == ChatMemberStatus.LEFT:
+            url = await gen_link(app, update_channel)
+            caption = f"Join our channel to use the bot"
+            await message.reply_photo(photo="https://graph.org/file/d44f024a08ded19452152.jpg",caption=caption, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("Join Now...", url=f"{url}")]]))
+            return 1
       except Exception:
          await message.reply_text("Something Went Wrong. Contact us @devgaganin...")
          return 1
@@ -88,38 +124,33 @@ PROGRESS_BAR = """\n
 │ **__ETA:__** {4}
 ╰─────────────────────╯
 """
-async def progress_bar(current, total, ud_type, message, start):
-
-    now = time.time()
-    diff = now - start
-    if round(diff % 10.00) == 0 or current == total:
-
-        percentage = current * 100 / total
-        speed = current / diff
-        elapsed_time = round(diff) * 1000
-        time_to_completion = round((total - current) / speed) * 1000
-        estimated_total_time = elapsed_time + time_to_completion
-
-        elapsed_time = TimeFormatter(milliseconds=elapsed_time)
-        estimated_total_time = TimeFormatter(milliseconds=estimated_total_time)
-
-        progress = "{0}{1}".format(
-            ''.join(["♦" for i in range(math.floor(percentage / 10))]),
-            ''.join(["◇" for i in range(10 - math.floor(percentage / 10))]))
-
-        tmp = progress + PROGRESS_BAR.format( 
-            round(percentage, 2),
-            humanbytes(current),
-            humanbytes(total),
-            humanbytes(speed),
+def render_progress(current, total, ud_type, start):
+    diff = max(time.time() - start, 0.001)
+    percentage = current * 100 / total if total else 100
+    speed = current / diff
+    elapsed_time = round(diff) * 1000
+    time_to_completion = round((total - current) / speed) * 1000 if speed else 0
+    estimated_total_time = elapsed_time + time_to_completion
+
+    estimated_total_time = TimeFormatter(milliseconds=estimated_total_time)
+
+    progress = "{0}{1}".format(
+        ''.join(["♦" for i in range(math.floor(percentage / 10))]),
+        ''.join(["◇" for i in range(10 - math.floor(percentage / 10))]))
+
+    tmp = progress + PROGRESS_BAR.format( 
+        round(percentage, 2),
+        humanbytes(current),
+        humanbytes(total),
+        humanbytes(speed),
+
+        estimated_total_time if estimated_total_time != '' else "0 s"
+    )
+    return "{}\n│ {}".format(ud_type, tmp)
 
-            estimated_total_time if estimated_total_time != '' else "0 s"
-        )
-        try:
-            await message.edit(
-                text="{}\n│ {}".format(ud_type, tmp),)             
-        except:
-            pass
+async def progress_bar(current, total, ud_type, message, start):
+    # Only records the state; progress_hub decides when the message is actually edited
+    progress_hub.publish(message, render_progress, current, total, ud_type, start, final=current == total)
 
 def humanbytes(size):
     if not size:
@@ -174,31 +205,9 @@ def get_link(string):
             return False
     except Exception:
         return False
-def video_metadata(file):
-    default_values = {'width': 1, 'height': 1, 'duration': 1}
-    try:
-        vcap = cv2.VideoCapture(file)
-        if not vcap.isOpened():
-            return default_values  
-
-        width = round(vcap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = round(vcap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = vcap.get(cv2.CAP_PROP_FPS)
-        frame_count = vcap.get(cv2.CAP_PROP_FRAME_COUNT)
-
-        if fps <= 0:
-            return default_values  
-
-        duration = round(frame_count / fps)
-        if duration <= 0:
-            return default_values  
-
-        vcap.release()
-        return {'width': width, 'height': height, 'duration': duration}
-
-    except Exception as e:
-        print(f"Error in video_metadata: {e}")
-        return default_values
+async def video_metadata(file):
+    """Width, height, duration and codec of a video, probed off the event loop and memoized"""
+    return await media_probe.probe(file)
 
 def hhmmss(seconds):
     return time.strftime('%H:%M:%S',time.gmtime(seconds))
@@ -206,43 +215,16 @@ def hhmmss(seconds):
 async def screenshot(video, duration, sender):
     if os.path.exists(f'{sender}.jpg'):
         return f'{sender}.jpg'
-    time_stamp = hhmmss(int(duration)/2)
-    out = dt.now().isoformat("_", "seconds") + ".jpg"
-    cmd = ["ffmpeg",
-           "-ss",
-           f"{time_stamp}", 
-           "-i",
-           f"{video}",
-           "-frames:v",
-           "1", 
-           f"{out}",
-           "-y"
-          ]
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await process.communicate()
-    x = stderr.decode().strip()
-    y = stdout.decode().strip()
-    if os.path.isfile(out):
-        return out
-    else:
-        None  
-last_update_time = time.time()
-async def progress_callback(current, total, progress_message):
-    percent = (current / total) * 100
-    global last_update_time
-    current_time = time.time()
-
-    if current_time - last_update_time >= 10 or percent % 10 == 0:
-        completed_blocks = int(percent // 10)
-        remaining_blocks = 10 - completed_blocks
-        progress_bar = "♦" * completed_blocks + "◇" * remaining_blocks
-        current_mb = current / (1024 * 1024)  
-        total_mb = total / (1024 * 1024)      
-        await progress_message.edit(
+    return await thumbnail_service.get(video=video, duration=duration)
+
+def render_upload(current, total):
+    percent = (current / total) * 100 if total else 100
+    completed_blocks = int(percent // 10)
+    remaining_blocks = 10 - completed_blocks
+    progress_bar = "♦" * completed_blocks + "◇" * remaining_blocks
+    current_mb = current / (1024 * 1024)  
+    total_mb = total / (1024 * 1024)      
+    return (
     f"╭──────────────────╮\n"
     f"│        **__Uploading...__**       \n"
     f"├──────────\n"
@@ -251,39 +233,10 @@ async def progress_callback(current, total, progress_message):
     f"│ **__Uploaded:__** {current_mb:.2f} MB / {total_mb:.2f} MB\n"
     f"╰──────────────────╯\n\n"
     f"**__Powered by Team SPY__**"
-        )
-
-        last_update_time = current_time
-async def prog_bar(current, total, ud_type, message, start):
-
-    now = time.time()
-    diff = now - start
-    if round(diff % 10.00) == 0 or current == total:
-
-        percentage = current * 100 / total
-        speed = current / diff
-        elapsed_time = round(diff) * 1000
-        time_to_completion = round((total - current) / speed) * 1000
-        estimated_total_time = elapsed_time + time_to_completion
-
-        elapsed_time = TimeFormatter(milliseconds=elapsed_time)
-        estimated_total_time = TimeFormatter(milliseconds=estimated_total_time)
-
-        progress = "{0}{1}".format(
-            ''.join(["♦" for i in range(math.floor(percentage / 10))]),
-            ''.join(["◇" for i in range(10 - math.floor(percentage / 10))]))
-
-        tmp = progress + PROGRESS_BAR.format( 
-            round(percentage, 2),
-            humanbytes(current),
-            humanbytes(total),
-            humanbytes(speed),
+    )
 
-            estimated_total_time if estimated_total_time != '' else "0 s"
-        )
-        try:
-            await message.edit_text(
-                text="{}\n│ {}".format(ud_type, tmp),)             
+async def progress_callback(current, total, progress_message):
+    progress_hub.publish(progress_message, render_upload, current, total, final=current == total)
 
-        except:
-            pass
+async def prog_bar(current, total, ud_type, message, start):
+    progress_hub.publish(message, render_progress, current, total, ud_type, start, final=current == total)
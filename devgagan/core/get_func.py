@@ -13,28 +13,42 @@
 # ---------------------------------------------------
 
 import asyncio
+import hashlib
 import os
 import re
 import time
 import gc
+import uuid
 from typing import Dict, Set, Optional, Union, Any, Tuple, List
 from pathlib import Path
 from functools import lru_cache, wraps
 from collections import defaultdict
 from dataclasses import dataclass, field
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, nullcontext
 import aiofiles
-import pymongo
+from motor.motor_asyncio import AsyncIOMotorClient
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
-from pyrogram.errors import ChannelBanned, ChannelInvalid, ChannelPrivate, ChatIdInvalid, ChatInvalid, RPCError
+from pyrogram.errors import ChannelBanned, ChannelInvalid, ChannelPrivate, ChatIdInvalid, ChatInvalid, FloodWait, RPCError
 from pyrogram.enums import MessageMediaType, ParseMode
 from telethon.tl.types import DocumentAttributeVideo
 from telethon import events, Button
 from devgagan import app, sex as gf
 from devgagan.core.func import *
 from devgagan.core.mongo import db as odb
+from devgagan.core.mongo import cache_db
+from devgagan.core.relay import StreamRelay
+from devgagan.core.fast_download import fast_download, partial_paths
+from devgagan.core.splitter import upload_split_parts
+from devgagan.core.userbot_pool import userbot_pool
+from devgagan.core.cache import UserCache
+from devgagan.core.text_rules import TextRules
+from devgagan.core.markdown import markdown_to_html
+from devgagan.core.progress import progress_hub
+from devgagan.core.thumbnails import thumbnail_service
+from devgagan.core.admission import disk_admission
+from devgagan.core.batch import ItemCancelled
 from devgagantools import fast_upload
-from config import MONGO_DB as MONGODB_CONNECTION_STRING, LOG_GROUP, OWNER_ID, STRING, API_ID, API_HASH
+from config import MONGO_DB as MONGODB_CONNECTION_STRING, LOG_GROUP, OWNER_ID, STRING, API_ID, API_HASH, RELAY_MODE, RELAY_BUFFER_MB, DOWNLOAD_CONNECTIONS, PARALLEL_DOWNLOAD_MIN_MB, DOWNLOAD_RETRIES, FLOOD_MAX_WAIT, SPLIT_UPLOAD_WORKERS, USER_CACHE_SIZE, USER_CACHE_TTL, THUMB_CACHE_DIR
 
 # Import pro userbot if STRING is available
 if STRING:
@@ -64,73 +78,155 @@ class BotConfig:
     PART_SIZE: int = int(1.9 * 1024**3)  # 1.9GB for splitting
     SETTINGS_PIC: str = "settings.jpg"
 
+@dataclass
+class UserProfile:
+    """User settings needed for one job, loaded once and shared by every file of it"""
+    user_id: int
+    custom_caption: str = ""
+    delete_words: List[str] = field(default_factory=list)
+    replacement_words: Dict[str, str] = field(default_factory=dict)
+    rename_tag: str = "Team SPY"
+    upload_method: str = "Pyrogram"
+    target_chat: str = ""
+    thumb_id: str = ""
+    text_rules: TextRules = field(default_factory=TextRules)
+
+    # Everything a job needs lives in MongoDB, so a worker process sees the same settings as the bot
+    FIELDS = ("custom_caption", "delete_words", "replacement_words", "rename_tag", "upload_method",
+              "target_chat", "thumb_id")
+
+    @classmethod
+    def from_record(cls, user_id: int, record: Dict[str, Any]) -> "UserProfile":
+        values = {key: record[key] for key in cls.FIELDS if record.get(key) is not None}
+        return cls(user_id=user_id, **values)
+
 @dataclass
 class UserProgress:
     previous_done: int = 0
     previous_time: float = field(default_factory=time.time)
 
 class DatabaseManager:
-    """Enhanced database operations with error handling and caching"""
+    """Async database operations with error handling and caching"""
     def __init__(self, connection_string: str, db_name: str, collection_name: str):
-        self.client = pymongo.MongoClient(connection_string)
+        self.client = AsyncIOMotorClient(connection_string)
         self.collection = self.client[db_name][collection_name]
-        self._cache = {}
+        self._cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL)
     
-    def get_user_data(self, user_id: int, key: str, default=None) -> Any:
-        cache_key = f"{user_id}:{key}"
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-        
-        try:
-            doc = self.collection.find_one({"_id": user_id})
-            value = doc.get(key, default) if doc else default
-            self._cache[cache_key] = value
-            return value
-        except Exception as e:
-            print(f"Database read error: {e}")
-            return default
+    async def _get_record(self, user_id: int) -> Optional[Dict[str, Any]]:
+        record = self._cache.get(user_id)
+        if record is None:
+            try:
+                record = await self.collection.find_one(
+                    {"_id": user_id}, {key: 1 for key in UserProfile.FIELDS}
+                ) or {}
+            except Exception as e:
+                print(f"Database read error: {e}")
+                return None
+            self._cache.set(user_id, record)
+        return record
+    
+    async def get_user_data(self, user_id: int, key: str, default=None) -> Any:
+        if key not in UserProfile.FIELDS:
+            try:
+                doc = await self.collection.find_one({"_id": user_id}, {key: 1})
+                return doc.get(key, default) if doc else default
+            except Exception as e:
+                print(f"Database read error: {e}")
+                return default
+        record = await self._get_record(user_id)
+        return record.get(key, default) if record is not None else default
+    
+    async def get_user_profile(self, user_id: int) -> UserProfile:
+        """All per-file settings of a user in one (cached) projected read"""
+        record = await self._get_record(user_id) or {}
+        profile = UserProfile.from_record(user_id, record)
+        # Compiled rules live in the cached record, so they are rebuilt only after the words change
+        if record.get("_text_rules") is None:
+            record["_text_rules"] = TextRules(profile.delete_words, profile.replacement_words)
+        profile.text_rules = record["_text_rules"]
+        return profile
     
-    def save_user_data(self, user_id: int, key: str, value: Any) -> bool:
-        cache_key = f"{user_id}:{key}"
+    async def save_user_data(self, user_id: int, key: str, value: Any) -> bool:
         try:
-            self.collection.update_one(
+            await self.collection.update_one(
                 {"_id": user_id}, 
                 {"$set": {key: value}}, 
                 upsert=True
             )
-            self._cache[cache_key] = value
+            if key in UserProfile.FIELDS:
+                self._cache.update(user_id, key, value)
+                self._cache.update(user_id, "_text_rules", None)
             return True
         except Exception as e:
             print(f"Database save error for {key}: {e}")
             return False
     
+    async def save_thumbnail(self, user_id: int, data: Optional[bytes]) -> bool:
+        """Store a custom thumbnail's bytes, or remove it with None; `thumb_id` names the current one"""
+        try:
+            if data:
+                thumb_id = hashlib.sha1(data).hexdigest()[:16]
+                await self.collection.update_one(
+                    {"_id": user_id}, {"$set": {"thumbnail": data, "thumb_id": thumb_id}}, upsert=True
+                )
+            else:
+                thumb_id = ""
+                await self.collection.update_one({"_id": user_id}, {"$unset": {"thumbnail": "", "thumb_id": ""}})
+            self._cache.update(user_id, "thumb_id", thumb_id)
+            return True
+        except Exception as e:
+            print(f"Thumbnail save error: {e}")
+            return False
+    
     def clear_user_cache(self, user_id: int):
         """Clear cache for specific user"""
-        keys_to_remove = [key for key in self._cache.keys() if key.startswith(f"{user_id}:")]
-        for key in keys_to_remove:
-            del self._cache[key]
+        self._cache.invalidate(user_id)
     
-    def get_protected_channels(self) -> Set[int]:
+    def cache_stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+    
+    async def watch_changes(self):
+        """Drop cached users written by other processes (needs a replica set for change streams)"""
+        while True:
+            try:
+                async with self.collection.watch() as stream:
+                    async for change in stream:
+                        user_id = change.get("documentKey", {}).get("_id")
+                        if user_id is not None:
+                            self._cache.invalidate(user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if getattr(e, "code", None) == 40573:  # standalone server, no change streams
+                    print(f"Settings change stream unavailable, cache relies on TTL: {e}")
+                    return
+                print(f"Settings change stream error: {e}")
+                # Anything written while disconnected may be stale
+                self._cache.clear()
+                await asyncio.sleep(5)
+    
+    async def get_protected_channels(self) -> Set[int]:
         try:
-            return {doc["channel_id"] for doc in self.collection.find({"channel_id": {"$exists": True}})}
+            return {doc["channel_id"] async for doc in self.collection.find({"channel_id": {"$exists": True}})}
         except:
             return set()
     
-    def lock_channel(self, channel_id: int) -> bool:
+    async def lock_channel(self, channel_id: int) -> bool:
         try:
-            self.collection.insert_one({"channel_id": channel_id})
+            await self.collection.insert_one({"channel_id": channel_id})
             return True
         except:
             return False
     
-    def reset_user_data(self, user_id: int) -> bool:
+    async def reset_user_data(self, user_id: int) -> bool:
         try:
-            self.collection.update_one(
+            await self.collection.update_one(
                 {"_id": user_id}, 
                 {"$unset": {
                     "delete_words": "", "replacement_words": "", 
                     "watermark_text": "", "duration_limit": "",
-                    "custom_caption": "", "rename_tag": ""
+                    "custom_caption": "", "rename_tag": "",
+                    "target_chat": "", "thumbnail": "", "thumb_id": ""
                 }}
             )
             self.clear_user_cache(user_id)
@@ -217,27 +313,7 @@ class CaptionFormatter:
     @staticmethod
     async def markdown_to_html(caption: str) -> str:
         """Convert markdown formatting to HTML"""
-        if not caption:
-            return ""
-        
-        replacements = [
-            (r"^> (.*)", r"<blockquote>\1</blockquote>"),
-            (r"```(.*?)```", r"<pre>\1</pre>"),
-            (r"`(.*?)`", r"<code>\1</code>"),
-            (r"\*\*(.*?)\*\*", r"<b>\1</b>"),
-            (r"\*(.*?)\*", r"<b>\1</b>"),
-            (r"__(.*?)__", r"<i>\1</i>"),
-            (r"_(.*?)_", r"<i>\1</i>"),
-            (r"~~(.*?)~~", r"<s>\1</s>"),
-            (r"\|\|(.*?)\|\|", r"<details>\1</details>"),
-            (r"\[(.*?)\]\((.*?)\)", r'<a href="\2">\1</a>')
-        ]
-        
-        result = caption
-        for pattern, replacement in replacements:
-            result = re.sub(pattern, replacement, result, flags=re.MULTILINE | re.DOTALL)
-        
-        return result.strip()
+        return markdown_to_html(caption)
 
 class FileOperations:
     """File operations with enhanced error handling"""
@@ -261,32 +337,26 @@ class FileOperations:
             except Exception as e:
                 print(f"Error removing file {file_path}: {e}")
     
-    async def process_filename(self, file_path: str, user_id: int) -> str:
+    async def process_filename(self, file_path: str, profile: UserProfile) -> str:
         """Process filename with user preferences"""
-        delete_words = set(self.db.get_user_data(user_id, "delete_words", []))
-        replacements = self.db.get_user_data(user_id, "replacement_words", {})
-        rename_tag = self.db.get_user_data(user_id, "rename_tag", "Team SPY")
-        
         path = Path(file_path)
-        name = path.stem
-        extension = path.suffix.lstrip('.')
-        
-        # Process filename
-        for word in delete_words:
-            name = name.replace(word, "")
+        new_path = path.parent / self.build_filename(path.name, profile)
         
-        for word, replacement in replacements.items():
-            name = name.replace(word, replacement)
+        await asyncio.to_thread(os.rename, file_path, new_path)
+        return str(new_path)
+    
+    def build_filename(self, file_name: str, profile: UserProfile) -> str:
+        """Apply user rename preferences to a bare filename without touching disk"""
+        path = Path(file_name)
+        name = profile.text_rules.apply(path.stem)
+        extension = path.suffix.lstrip('.')
+        rename_tag = profile.rename_tag
         
         # Normalize extension for videos
         if extension.lower() in self.config.VIDEO_EXTS and extension.lower() not in ['mp4']:
             extension = 'mp4'
         
-        new_name = f"{name.strip()} {rename_tag}.{extension}"
-        new_path = path.parent / new_name
-        
-        await asyncio.to_thread(os.rename, file_path, new_path)
-        return str(new_path)
+        return f"{name.strip()} {rename_tag}.{extension}"
     
     async def split_large_file(self, file_path: str, app_client, sender: int, target_chat_id: int, caption: str, topic_id: Optional[int] = None):
         """Split large files into smaller parts"""
@@ -299,42 +369,15 @@ class FileOperations:
             sender, f"ℹ️ File size: {file_size / (1024**2):.2f} MB\n🔄 Splitting and uploading..."
         )
 
-        part_number = 0
-        base_path = Path(file_path)
-        
         try:
-            async with aiofiles.open(file_path, mode="rb") as f:
-                while True:
-                    chunk = await f.read(self.config.PART_SIZE)
-                    if not chunk:
-                        break
-
-                    part_file = f"{base_path.stem}.part{str(part_number).zfill(3)}{base_path.suffix}"
-
-                    async with aiofiles.open(part_file, mode="wb") as part_f:
-                        await part_f.write(chunk)
-
-                    part_caption = f"{caption}\n\n**Part: {part_number + 1}**" if caption else f"**Part: {part_number + 1}**"
-                    
-                    edit_msg = await app_client.send_message(target_chat_id, f"⬆️ Uploading part {part_number + 1}...")
-                    
-                    try:
-                        result = await app_client.send_document(
-                            target_chat_id,
-                            document=part_file,
-                            caption=part_caption,
-                            reply_to_message_id=topic_id,
-                            progress=progress_bar,
-                            progress_args=("╭──────────────╮\n│ **__Pyro Uploader__**\n├────────", edit_msg, time.time())
-                        )
-                        await result.copy(LOG_GROUP)
-                        await edit_msg.delete()
-                    finally:
-                        if os.path.exists(part_file):
-                            os.remove(part_file)
-                    
-                    part_number += 1
-
+            # Parts are byte-range views of the original file, uploaded in parallel and delivered in order
+            await upload_split_parts(
+                app_client, file_path, self.config.PART_SIZE, target_chat_id, caption, LOG_GROUP,
+                topic_id=topic_id,
+                workers=SPLIT_UPLOAD_WORKERS,
+                progress=progress_bar,
+                progress_header="╭──────────────╮\n│ **__Pyro Uploader__**\n├────────"
+            )
         finally:
             await start_msg.delete()
             if os.path.exists(file_path):
@@ -349,22 +392,61 @@ class SmartTelegramBot:
         self.progress_manager = ProgressManager()
         self.file_ops = FileOperations(self.config, self.db)
         self.caption_formatter = CaptionFormatter()
+        self.relay = StreamRelay(buffer_bytes=RELAY_BUFFER_MB * 1024**2)
         
         # User session management
         self.user_sessions: Dict[int, str] = {}
         self.pending_photos: Set[int] = set()
-        self.user_chat_ids: Dict[int, str] = {}
         self.user_rename_prefs: Dict[str, str] = {}
-        self.user_caption_prefs: Dict[str, str] = {}
         
         # Pro userbot reference
         self.pro_client = pro
         print(f"Pro client available: {'Yes' if self.pro_client else 'No'}")
     
-    def get_thumbnail_path(self, user_id: int) -> Optional[str]:
-        """Get user's custom thumbnail path"""
-        thumb_path = f'{user_id}.jpg'
-        return thumb_path if os.path.exists(thumb_path) else None
+    async def get_thumbnail_path(self, user_id: int) -> Optional[str]:
+        """User's custom thumbnail as a local file, fetched from MongoDB the first time this process needs it"""
+        profile = await self.load_profile(user_id)
+        thumb_id = profile.thumb_id or await self._import_legacy_thumbnail(user_id)
+        if not thumb_id:
+            return None
+        
+        thumb_dir = os.path.join(THUMB_CACHE_DIR, "users")
+        thumb_path = os.path.join(thumb_dir, f"{user_id}_{thumb_id}.jpg")
+        if os.path.exists(thumb_path):
+            return thumb_path
+        data = await self.db.get_user_data(user_id, "thumbnail")
+        if not data:
+            return None
+        os.makedirs(thumb_dir, exist_ok=True)
+        tmp = f"{thumb_path}.{uuid.uuid4().hex}.tmp"
+        async with aiofiles.open(tmp, "wb") as f:
+            await f.write(data)
+        os.replace(tmp, thumb_path)
+        # Older versions of this user's thumbnail are no longer referenced
+        for name in os.listdir(thumb_dir):
+            if name.startswith(f"{user_id}_") and name.endswith(".jpg") and name != os.path.basename(thumb_path):
+                os.remove(os.path.join(thumb_dir, name))
+        return thumb_path
+    
+    async def _import_legacy_thumbnail(self, user_id: int) -> Optional[str]:
+        """Move a `<user_id>.jpg` saved by older versions into MongoDB; returns its thumb_id"""
+        legacy_path = f'{user_id}.jpg'
+        if not os.path.exists(legacy_path):
+            return None
+        async with aiofiles.open(legacy_path, "rb") as f:
+            data = await f.read()
+        if not await self.db.save_thumbnail(user_id, data):
+            return None
+        os.remove(legacy_path)
+        return (await self.load_profile(user_id)).thumb_id
+    
+    @staticmethod
+    def has_custom_thumbnail(profile: UserProfile) -> bool:
+        return bool(profile.thumb_id) or os.path.exists(f'{profile.user_id}.jpg')
+    
+    async def resolve_thumbnail(self, user_id: int, file_path: Optional[str] = None, duration: Optional[int] = None, userbot=None, src_msg=None) -> Optional[str]:
+        """User's custom thumbnail, else the source message's own, else a frame of the video"""
+        return await self.get_thumbnail_path(user_id) or await thumbnail_service.get(file_path, duration, userbot, src_msg)
     
     def parse_target_chat(self, target: str) -> Tuple[int, Optional[int]]:
         """Parse chat ID and topic ID from target string"""
@@ -373,22 +455,16 @@ class SmartTelegramBot:
             return int(parts[0]), int(parts[1])
         return int(target), None
     
-    async def process_user_caption(self, original_caption: str, user_id: int) -> str:
+    async def load_profile(self, user_id: int) -> UserProfile:
+        """Load a user's settings once per job"""
+        return await self.db.get_user_profile(user_id)
+    
+    async def process_user_caption(self, original_caption: str, profile: UserProfile) -> str:
         """Process caption with user preferences"""
-        custom_caption = self.user_caption_prefs.get(str(user_id), "") or self.db.get_user_data(user_id, "custom_caption", "")
-        delete_words = set(self.db.get_user_data(user_id, "delete_words", []))
-        replacements = self.db.get_user_data(user_id, "replacement_words", {})
-        
-        # Process original caption
-        processed = original_caption or ""
+        custom_caption = profile.custom_caption
         
-        # Remove delete words
-        for word in delete_words:
-            processed = processed.replace(word, "")
-        
-        # Apply replacements
-        for word, replacement in replacements.items():
-            processed = processed.replace(word, replacement)
+        # Remove delete words and apply replacements in one pass
+        processed = profile.text_rules.apply(original_caption or "")
         
         # Add custom caption
         if custom_caption:
@@ -396,30 +472,21 @@ class SmartTelegramBot:
         
         return processed if processed else None
 
-    async def upload_with_pyrogram(self, file_path: str, user_id: int, target_chat_id: int, caption: str, topic_id: Optional[int] = None, edit_msg=None):
+    async def upload_with_pyrogram(self, file_path: str, user_id: int, target_chat_id: int, caption: str, topic_id: Optional[int] = None, edit_msg=None, source: Optional[dict] = None, userbot=None, src_msg=None):
         """Upload using Pyrogram with proper file type detection"""
         file_type = self.media_processor.get_file_type(file_path)
-        thumb_path = self.get_thumbnail_path(user_id)
         
         progress_args = ("╭──────────────╮\n│ **__Pyro Uploader__**\n├────────", edit_msg, time.time())
         
         try:
             if file_type == 'video':
                 # Get video metadata
-                metadata = {}
-                if 'video_metadata' in globals():
-                    metadata = video_metadata(file_path)
+                metadata = await video_metadata(file_path)
                 
                 width = metadata.get('width', 0)
                 height = metadata.get('height', 0)
                 duration = metadata.get('duration', 0)
-                
-                # Generate thumbnail if not exists
-                if not thumb_path and 'screenshot' in globals():
-                    try:
-                        thumb_path = await screenshot(file_path, duration, user_id)
-                    except:
-                        pass
+                thumb_path = await self.resolve_thumbnail(user_id, file_path, duration, userbot, src_msg)
                 
                 result = await app.send_video(
                     chat_id=target_chat_id,
@@ -458,6 +525,7 @@ class SmartTelegramBot:
                 )
                 
             else:  # document
+                thumb_path = await self.resolve_thumbnail(user_id, userbot=userbot, src_msg=src_msg)
                 result = await app.send_document(
                     chat_id=target_chat_id,
                     document=file_path,
@@ -470,7 +538,8 @@ class SmartTelegramBot:
                 )
             
             # Copy to log group
-            await result.copy(LOG_GROUP)
+            log_msg = await self._mirror_to_log(result)
+            await self._remember_upload(source, log_msg, os.path.basename(file_path))
             return result
             
         except Exception as e:
@@ -483,7 +552,7 @@ class SmartTelegramBot:
                 except:
                     pass
 
-    async def upload_with_telethon(self, file_path: str, user_id: int, target_chat_id: int, caption: str, topic_id: Optional[int] = None, edit_msg=None):
+    async def upload_with_telethon(self, file_path: str, user_id: int, target_chat_id: int, caption: str, topic_id: Optional[int] = None, edit_msg=None, source: Optional[dict] = None, userbot=None, src_msg=None):
         """Upload using Telethon (SpyLib) with enhanced features"""
         try:
             if edit_msg:
@@ -495,7 +564,7 @@ class SmartTelegramBot:
             # Upload file using fast_upload
             uploaded = await fast_upload(
                 gf, file_path,
-                reply=progress_message,
+                reply=progress_hub.reply_proxy(progress_message),
                 name=None,
                 progress_bar_function=lambda done, total: self.progress_manager.calculate_progress(done, total, user_id, "SpyLib"),
                 user_id=user_id
@@ -508,16 +577,13 @@ class SmartTelegramBot:
             file_type = self.media_processor.get_file_type(file_path)
             
             if file_type == 'video':
-                if 'video_metadata' in globals():
-                    metadata = video_metadata(file_path)
-                    duration = metadata.get('duration', 0)
-                    width = metadata.get('width', 0)
-                    height = metadata.get('height', 0)
-                    attributes = [DocumentAttributeVideo(
-                        duration=duration, w=width, h=height, supports_streaming=True
-                    )]
-            
-            thumb_path = self.get_thumbnail_path(user_id)
+                metadata = await video_metadata(file_path)
+                attributes = [DocumentAttributeVideo(
+                    duration=metadata['duration'], w=metadata['width'], h=metadata['height'], supports_streaming=True
+                )]
+                thumb_path = await self.resolve_thumbnail(user_id, file_path, metadata['duration'], userbot, src_msg)
+            else:
+                thumb_path = await self.resolve_thumbnail(user_id, userbot=userbot, src_msg=src_msg)
             
             # Send to target chat
             await gf.send_file(
@@ -530,21 +596,115 @@ class SmartTelegramBot:
                 thumb=thumb_path
             )
             
-            # Send to log group
-            await gf.send_file(
-                LOG_GROUP,
-                uploaded,
-                caption=html_caption,
-                attributes=attributes,
-                parse_mode='html',
-                thumb=thumb_path
-            )
+            # Send to log group; the user already has the file, so a failure here must not retry the upload
+            try:
+                log_msg = await gf.send_file(
+                    LOG_GROUP,
+                    uploaded,
+                    caption=html_caption,
+                    attributes=attributes,
+                    parse_mode='html',
+                    thumb=thumb_path
+                )
+            except Exception as e:
+                print(f"Log group copy failed: {e}")
+                log_msg = None
+            await self._remember_upload(source, log_msg, os.path.basename(file_path))
             
         except Exception as e:
             await app.send_message(LOG_GROUP, f"**SpyLib Upload Failed:** {str(e)}")
             raise
 
-    async def handle_large_file_upload(self, file_path: str, sender: int, edit_msg, caption: str):
+    async def reserve_disk(self, file_size: int, edit_msg, turn=None, partial: Optional[str] = None):
+        """Reserve scratch space before a download; waits in line, with a notice, while the disk is full.
+
+        Batch items pass their `turn` so reservations are taken in sequence order.
+        """
+        waited = False
+
+        async def notify():
+            nonlocal waited
+            waited = True
+            await edit_msg.edit("**⏳ Waiting for free disk space...**")
+
+        def acquire():
+            return disk_admission.acquire(file_size, on_wait=notify if edit_msg else None, partial=partial)
+
+        admit = getattr(turn, "admit", None)
+        try:
+            reservation = await (admit(acquire) if admit else acquire())
+        except OSError as e:
+            if edit_msg:
+                await edit_msg.edit(f"**❌ {e}**")
+            raise
+        if waited:
+            await edit_msg.edit("**📥 Downloading...**")
+        return reservation
+
+    async def download_media(self, userbot, msg, filename: str, file_size: int, progress_args: tuple) -> str:
+        """Download media, spreading large files over parallel connections.
+
+        Large files are fetched into a resumable partial, so a retry after a FloodWait or a
+        dropped connection only asks for the chunks that are still missing. The last attempt
+        fetches one range at a time; if it fails too the partial is kept for the next request.
+        """
+        if not file_size or file_size < PARALLEL_DOWNLOAD_MIN_MB * 1024**2:
+            return await userbot.download_media(
+                msg, file_name=filename, progress=progress_bar, progress_args=progress_args
+            )
+        
+        for attempt in range(DOWNLOAD_RETRIES + 1):
+            last = attempt == DOWNLOAD_RETRIES
+            try:
+                return await fast_download(
+                    userbot, msg, filename, file_size,
+                    connections=1 if last else DOWNLOAD_CONNECTIONS,
+                    progress=progress_bar,
+                    progress_args=progress_args
+                )
+            except FloodWait as e:
+                if e.value > FLOOD_MAX_WAIT or last:
+                    raise
+                print(f"Download paused for {e.value}s by FloodWait, resuming afterwards")
+                await asyncio.sleep(e.value)
+            except Exception as e:
+                if last:
+                    raise
+                delay = min(2 ** attempt, 30)
+                print(f"Download interrupted ({attempt + 1}/{DOWNLOAD_RETRIES}): {e}; resuming in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def relay_upload(self, userbot, msg, profile: UserProfile, target_chat_id: int, topic_id: Optional[int], caption: str, filename: str, file_size: int, media_type: str, edit_msg, source: Optional[dict] = None) -> bool:
+        """Stream media from userbot to target chat without a local copy; False means fall back to disk"""
+        sender = profile.user_id
+        file_name = self.file_ops.build_filename(filename, profile)
+        progress_args = ("╭──────────────╮\n│ **__Relay Uploader__**\n├────────", edit_msg, time.time())
+        
+        try:
+            result = await self.relay.send(
+                userbot, app, msg, target_chat_id,
+                file_name=file_name,
+                file_size=file_size,
+                media_type=media_type,
+                caption=caption,
+                topic_id=topic_id,
+                thumb=await self.resolve_thumbnail(sender, userbot=userbot, src_msg=msg),
+                progress=progress_bar,
+                progress_args=progress_args
+            )
+        except Exception as e:
+            print(f"Relay upload failed, falling back to download: {e}")
+            return False
+        
+        log_msg = await self._mirror_to_log(result)
+        await self._remember_upload(source, log_msg, file_name)
+        try:
+            await edit_msg.delete()
+        except:
+            pass
+        return True
+
+    async def handle_large_file_upload(self, file_path: str, sender: int, edit_msg, caption: str, userbot=None, src_msg=None):
         """Handle files larger than 2GB using pro client"""
         if not self.pro_client:
             await edit_msg.edit('**❌ 4GB upload not available - Pro client not configured**')
@@ -552,19 +712,17 @@ class SmartTelegramBot:
 
         await edit_msg.edit('**✅ 4GB upload starting...**')
         
-        target_chat_str = self.user_chat_ids.get(sender, str(sender))
-        target_chat_id, _ = self.parse_target_chat(target_chat_str)
+        profile = await self.load_profile(sender)
+        target_chat_id, _ = self.parse_target_chat(profile.target_chat or str(sender))
         
         file_type = self.media_processor.get_file_type(file_path)
-        thumb_path = self.get_thumbnail_path(sender)
         
         progress_args = ("╭──────────────╮\n│ **__4GB Uploader ⚡__**\n├────────", edit_msg, time.time())
         
         try:
             if file_type == 'video':
-                metadata = {}
-                if 'video_metadata' in globals():
-                    metadata = video_metadata(file_path)
+                metadata = await video_metadata(file_path)
+                thumb_path = await self.resolve_thumbnail(sender, file_path, metadata['duration'], userbot, src_msg)
                 
                 result = await self.pro_client.send_video(
                     LOG_GROUP,
@@ -578,6 +736,7 @@ class SmartTelegramBot:
                     progress_args=progress_args
                 )
             else:
+                thumb_path = await self.resolve_thumbnail(sender, userbot=userbot, src_msg=src_msg)
                 result = await self.pro_client.send_document(
                     LOG_GROUP,
                     document=file_path,
@@ -608,24 +767,33 @@ class SmartTelegramBot:
         finally:
             await edit_msg.delete()
 
-    async def handle_message_download(self, userbot, sender: int, edit_id: int, msg_link: str, offset: int, message):
-        """Main message processing function with enhanced error handling"""
+    async def handle_message_download(self, userbot, sender: int, edit_id: int, msg_link: str, offset: int, message, turn=None, profile: Optional[UserProfile] = None):
+        """Main message processing function with enhanced error handling.
+
+        `turn` is entered right before anything is delivered to the target chat, so batch
+        workers can download concurrently while still delivering in order. A batch passes
+        the same `profile` for every item so settings are read once per job.
+        """
         edit_msg = None
         file_path = None
+        reservation = None
+        turn = turn or nullcontext()
         
         try:
+            profile = profile or await self.load_profile(sender)
             # Parse and validate message link
             msg_link = msg_link.split("?single")[0]
-            protected_channels = self.db.get_protected_channels()
+            protected_channels = await self.db.get_protected_channels()
             
             # Extract chat and message info
-            chat_id, msg_id = await self._parse_message_link(msg_link, offset, protected_channels, sender, edit_id)
+            chat_id, msg_id = await self._parse_message_link(msg_link, offset, protected_channels, profile, edit_id, turn)
             if not chat_id:
                 return
             
             # Get target chat configuration
-            target_chat_str = self.user_chat_ids.get(message.chat.id, str(message.chat.id))
-            target_chat_id, topic_id = self.parse_target_chat(target_chat_str)
+            # Resumed batch jobs have no triggering message; their chat is the user's private chat
+            chat_key = message.chat.id if message else sender
+            target_chat_id, topic_id = self.parse_target_chat(profile.target_chat or str(chat_key))
             
             # Fetch message
             msg = await userbot.get_messages(chat_id, msg_id)
@@ -633,8 +801,10 @@ class SmartTelegramBot:
                 await app.delete_messages(sender, edit_id)
                 return
             
-            # Handle special message types
-            if await self._handle_special_messages(msg, target_chat_id, topic_id, edit_id, sender):
+            # Only deliveries wait for the turn, so later batch items keep downloading meanwhile
+            if msg.text or msg.media == MessageMediaType.WEB_PAGE_PREVIEW:
+                async with turn:
+                    await self._handle_special_messages(msg, target_chat_id, topic_id, edit_id, sender)
                 return
                 
             # Process media files
@@ -644,65 +814,106 @@ class SmartTelegramBot:
             filename, file_size, media_type = self.media_processor.get_media_info(msg)
             
             # Handle direct media types (voice, video_note, sticker)
-            if await self._handle_direct_media(msg, target_chat_id, topic_id, edit_id, media_type):
-                return
+            if media_type in ("sticker", "voice", "video_note"):
+                async with turn:
+                    if await self._handle_direct_media(msg, target_chat_id, topic_id, edit_id, media_type):
+                        return
             
-            # Download file
-            edit_msg = await app.edit_message_text(sender, edit_id, "**📥 Downloading...**")
+            # Unprotected sources are copied server-side, no bytes pass through the bot
+            caption = await self.process_user_caption(msg.caption.markdown if msg.caption else "", profile)
+            copy_clients = self._server_copy_clients(msg, profile, target_chat_id, media_type, filename, userbot)
+            if copy_clients:
+                async with turn:
+                    if await self._try_server_copy(msg, copy_clients, target_chat_id, topic_id, caption):
+                        await app.delete_messages(sender, edit_id)
+                        return
             
-            progress_args = ("╭──────────────╮\n│ **__Downloading...__**\n├────────", edit_msg, time.time())
-            file_path = await userbot.download_media(
-                msg, file_name=filename, progress=progress_bar, progress_args=progress_args
-            )
+            # Content already mirrored to LOG_GROUP is re-sent by file_id
+            source = self._cache_source(msg, media_type, file_size, profile)
+            cached_media = await self._find_cached_media(source, profile, filename)
+            if cached_media:
+                async with turn:
+                    if await self._send_cached_media(cached_media, target_chat_id, topic_id, caption):
+                        await app.delete_messages(sender, edit_id)
+                        return
             
-            # Process caption and filename
-            caption = await self.process_user_caption(msg.caption.markdown if msg.caption else "", sender)
-            file_path = await self.file_ops.process_filename(file_path, sender)
+            # Relay mode streams the source straight into the upload, skipping the disk
+            if RELAY_MODE and media_type in ("video", "document", "audio") and file_size <= self.config.SIZE_LIMIT:
+                async with turn:
+                    edit_msg = await app.edit_message_text(sender, edit_id, "**🔁 Relaying...**")
+                    if await self.relay_upload(userbot, msg, profile, target_chat_id, topic_id, caption, filename, file_size, media_type, edit_msg, source):
+                        return
             
-            # Handle photos separately
-            if media_type == "photo":
-                result = await app.send_photo(target_chat_id, file_path, caption=caption, reply_to_message_id=topic_id)
-                await result.copy(LOG_GROUP)
-                await edit_msg.delete()
-                return
+            # Download file; split uploads read byte ranges of it, so no extra space is needed
+            edit_msg = await app.edit_message_text(sender, edit_id, "**📥 Downloading...**")
+            reservation = await self.reserve_disk(file_size, edit_msg, turn, partial_paths(msg, filename)[0])
             
-            # Check file size and handle accordingly
-            upload_method = self.db.get_user_data(sender, "upload_method", "Pyrogram")
+            progress_args = ("╭──────────────╮\n│ **__Downloading...__**\n├────────", edit_msg, time.time())
+            file_path = await self.download_media(userbot, msg, filename, file_size, progress_args)
+            reservation.track(file_path)
             
-            if file_size > self.config.SIZE_LIMIT:
-                free_check = 0
-                if 'chk_user' in globals():
-                    free_check = await chk_user(chat_id, sender)
-                
-                if free_check == 1 or not self.pro_client:
-                    # Split file for free users or when pro client unavailable
-                    await edit_msg.delete()
-                    await self.file_ops.split_large_file(file_path, app, sender, target_chat_id, caption, topic_id)
+            # Process filename
+            file_path = await self.file_ops.process_filename(file_path, profile)
+            reservation.track(file_path)
+            
+            async with turn:
+                # Handle photos separately
+                if media_type == "photo":
+                    result = await app.send_photo(target_chat_id, file_path, caption=caption, reply_to_message_id=topic_id)
+                    log_msg = await self._mirror_to_log(result)
+                    await self._remember_upload(source, log_msg, None)
+                    try:
+                        await edit_msg.delete()
+                    except Exception:
+                        pass
                     return
+                
+                # Check file size and handle accordingly
+                upload_method = profile.upload_method
+                
+                if file_size > self.config.SIZE_LIMIT:
+                    free_check = 0
+                    if 'chk_user' in globals():
+                        free_check = await chk_user(chat_id, sender)
+                    
+                    if free_check == 1 or not self.pro_client:
+                        # Split file for free users or when pro client unavailable
+                        await edit_msg.delete()
+                        await self.file_ops.split_large_file(file_path, app, sender, target_chat_id, caption, topic_id)
+                        return
+                    else:
+                        # Use 4GB uploader
+                        await self.handle_large_file_upload(file_path, sender, edit_msg, caption, userbot, msg)
+                        return
+                
+                # Regular upload
+                if upload_method == "Telethon" and gf:
+                    await self.upload_with_telethon(file_path, sender, target_chat_id, caption, topic_id, edit_msg, source, userbot, msg)
                 else:
-                    # Use 4GB uploader
-                    await self.handle_large_file_upload(file_path, sender, edit_msg, caption)
-                    return
-            
-            # Regular upload
-            if upload_method == "Telethon" and gf:
-                await self.upload_with_telethon(file_path, sender, target_chat_id, caption, topic_id, edit_msg)
-            else:
-                await self.upload_with_pyrogram(file_path, sender, target_chat_id, caption, topic_id, edit_msg)
+                    await self.upload_with_pyrogram(file_path, sender, target_chat_id, caption, topic_id, edit_msg, source, userbot, msg)
                     
         except (ChannelBanned, ChannelInvalid, ChannelPrivate, ChatIdInvalid, ChatInvalid) as e:
             await app.edit_message_text(sender, edit_id, "❌ Access denied. Have you joined the channel?")
+            raise
+        except (FloodWait, ItemCancelled):
+            # Let the caller pace and retry, or stop, instead of reporting an error
+            raise
         except Exception as e:
             print(f"Error in message handling: {e}")
             await app.send_message(LOG_GROUP, f"**Error:** {str(e)}")
+            # Callers (the batch executor in particular) must see the item as failed
+            raise
         finally:
             # Cleanup
             if file_path:
                 await self.file_ops._cleanup_file(file_path)
+            if reservation:
+                reservation.release()
             gc.collect()
 
-    async def _parse_message_link(self, msg_link: str, offset: int, protected_channels: Set[int], sender: int, edit_id: int) -> Tuple[Optional[int], Optional[int]]:
+    async def _parse_message_link(self, msg_link: str, offset: int, protected_channels: Set[int], profile: UserProfile, edit_id: int, turn=None) -> Tuple[Optional[int], Optional[int]]:
         """Parse different types of message links"""
+        sender = profile.user_id
         if 't.me/c/' in msg_link or 't.me/b/' in msg_link:
             parts = msg_link.split("/")
             if 't.me/b/' in msg_link:
@@ -728,7 +939,8 @@ class SmartTelegramBot:
             parts = msg_link.split("/")
             chat = f"-100{parts[3]}" if parts[3].isdigit() else parts[3]
             msg_id = int(parts[-1])
-            await self._download_user_stories(gf, chat, msg_id, sender, edit_id)
+            async with turn or nullcontext():
+                await self._download_user_stories(gf, chat, msg_id, sender, edit_id)
             return None, None
         
         else:
@@ -736,20 +948,144 @@ class SmartTelegramBot:
             await app.edit_message_text(sender, edit_id, "🔗 Public link detected...")
             chat = msg_link.split("t.me/")[1].split("/")[0]
             msg_id = int(msg_link.split("/")[-1])
-            await self._copy_public_message(app, gf, sender, chat, msg_id, edit_id)
+            async with turn or nullcontext():
+                await self._copy_public_message(app, gf, profile, chat, msg_id, edit_id)
             return None, None
 
+    def _cache_source(self, msg, media_type: str, file_size: int, profile: UserProfile) -> Optional[dict]:
+        """Identify cacheable source media; split and 4GB uploads are never cached"""
+        media = getattr(msg, media_type, None) if media_type in ("video", "document", "audio", "photo") else None
+        if not media or not getattr(media, "file_unique_id", None) or file_size > self.config.SIZE_LIMIT:
+            return None
+        # Cached copies are shared between users, so uploads carrying someone's own thumbnail stay out of it
+        if media_type != "photo" and self.has_custom_thumbnail(profile):
+            return None
+        return {"chat_id": msg.chat.id, "msg_id": msg.id, "file_unique_id": media.file_unique_id, "media_type": media_type}
+
+    @staticmethod
+    def _log_media_type(log_msg) -> str:
+        """Media attribute of a LOG_GROUP message, for both Pyrogram and Telethon messages"""
+        media = getattr(log_msg, "media", None)
+        if isinstance(media, MessageMediaType):
+            return media.value
+        for attr in ("video", "audio", "photo"):
+            if getattr(log_msg, attr, None):
+                return attr
+        return "document"
+
+    async def _mirror_to_log(self, result):
+        """Copy a delivered message to LOG_GROUP; the user already has it, so failures are only logged"""
+        try:
+            return await result.copy(LOG_GROUP)
+        except Exception as e:
+            print(f"Log group copy failed: {e}")
+            return None
+
+    async def _remember_upload(self, source: Optional[dict], log_msg, file_name: Optional[str]):
+        """Record the LOG_GROUP copy of an upload so repeat requests skip the transfer"""
+        if not source or log_msg is None:
+            return
+        try:
+            # The upload may have changed type (e.g. a document sent back as a video), so store what was sent
+            await cache_db.set_cached_file(
+                source["chat_id"], source["msg_id"], source["file_unique_id"],
+                log_msg.id, file_name, self._log_media_type(log_msg)
+            )
+        except Exception as e:
+            print(f"File cache write error: {e}")
+
+    async def _find_cached_media(self, source: Optional[dict], profile: UserProfile, filename: str):
+        """Media of the cached LOG_GROUP copy of `source`, or None if it has to be transferred"""
+        if not source:
+            return None
+        try:
+            cached = await cache_db.get_cached_file(source["chat_id"], source["msg_id"], source["file_unique_id"])
+        except Exception as e:
+            print(f"File cache read error: {e}")
+            return None
+        
+        # The cached copy carries the first requester's filename; only reuse it if this user's rename matches
+        if not cached or (source["media_type"] != "photo" and cached.get("file_name") != self.file_ops.build_filename(filename, profile)):
+            cache_db.cache_stats["misses"] += 1
+            return None
+        
+        try:
+            log_msg = await app.get_messages(LOG_GROUP, cached["log_msg_id"])
+        except Exception as e:
+            print(f"Cached log message lookup failed: {e}")
+            cache_db.cache_stats["misses"] += 1
+            return None
+        media = getattr(log_msg, self._log_media_type(log_msg), None) if log_msg and not log_msg.empty else None
+        if not media:
+            await cache_db.remove_cached_log_msg(cached["log_msg_id"])
+            cache_db.cache_stats["invalidations"] += 1
+            cache_db.cache_stats["misses"] += 1
+            return None
+        return media
+
+    async def _send_cached_media(self, media, target_chat_id: int, topic_id: Optional[int], caption: Optional[str]) -> bool:
+        """Re-send a cached LOG_GROUP file by file_id; False means it has to be transferred"""
+        try:
+            await app.send_cached_media(target_chat_id, media.file_id, caption=caption or "", reply_to_message_id=topic_id)
+        except FloodWait:
+            raise
+        except Exception as e:
+            print(f"Cached send failed, transferring instead: {e}")
+            cache_db.cache_stats["misses"] += 1
+            return False
+        cache_db.cache_stats["hits"] += 1
+        return True
+
+    def _server_copy_clients(self, msg, profile: UserProfile, target_chat_id: int, media_type: str, filename: str, userbot=None) -> list:
+        """Clients that may copy `msg` server-side, in the order to try them; empty means the byte path is needed"""
+        sender = profile.user_id
+        if getattr(msg, "has_protected_content", False) or getattr(msg.chat, "has_protected_content", False):
+            return []
+        
+        # A server-side copy keeps the original file, so the user's rename and thumbnail would be lost
+        if media_type != "photo" and (self.file_ops.build_filename(filename, profile) != filename or self.has_custom_thumbnail(profile)):
+            return []
+        
+        # The bot only sees public chats; the userbot only helps when the target is not the user's own chat
+        clients = [app] if getattr(msg.chat, "username", None) else []
+        if userbot and target_chat_id != sender:
+            clients.append(userbot)
+        return clients
+
+    async def _try_server_copy(self, msg, clients: list, target_chat_id: int, topic_id: Optional[int], caption: Optional[str]) -> bool:
+        """Copy media with copy_message through the first client allowed to; False means the byte path is needed"""
+        for client in clients:
+            try:
+                result = await client.copy_message(
+                    target_chat_id, msg.chat.id, msg.id,
+                    caption=caption,
+                    reply_to_message_id=topic_id
+                )
+            except FloodWait:
+                raise
+            except Exception as e:
+                print(f"Server-side copy via {'bot' if client is app else 'userbot'} not possible: {e}")
+                continue
+            
+            try:
+                await app.copy_message(LOG_GROUP, result.chat.id, result.id)
+            except Exception as e:
+                print(f"Log group copy failed: {e}")
+            return True
+        
+        return False
+
     async def _handle_special_messages(self, msg, target_chat_id: int, topic_id: Optional[int], edit_id: int, sender: int) -> bool:
         """Handle special message types that don't require downloading"""
         if msg.media == MessageMediaType.WEB_PAGE_PREVIEW:
             result = await app.send_message(target_chat_id, msg.text.markdown, reply_to_message_id=topic_id)
-            await result.copy(LOG_GROUP)
+            await self._mirror_to_log(result)
             await app.delete_messages(sender, edit_id)
             return True
         
         if msg.text:
             result = await app.send_message(target_chat_id, msg.text.markdown, reply_to_message_id=topic_id)
-            await result.copy(LOG_GROUP)
+            await self._mirror_to_log(result)
             await app.delete_messages(sender, edit_id)
             return True
             
@@ -768,7 +1104,7 @@ class SmartTelegramBot:
                 result = await app.send_video_note(target_chat_id, msg.video_note.file_id, reply_to_message_id=topic_id)
             
             if result:
-                await result.copy(LOG_GROUP)
+                await self._mirror_to_log(result)
                 await app.delete_messages(msg.chat.id, edit_id)
                 return True
                 
@@ -805,17 +1141,24 @@ class SmartTelegramBot:
         except RPCError as e:
             await app.edit_message_text(sender, edit_id, f"❌ Error: {e}")
 
-    async def _copy_public_message(self, app_client, userbot, sender: int, chat_id: str, message_id: int, edit_id: int):
+    async def _copy_public_message(self, app_client, userbot, profile: UserProfile, chat_id: str, message_id: int, edit_id: int):
         """Handle copying from public channels/groups"""
-        target_chat_str = self.user_chat_ids.get(sender, str(sender))
-        target_chat_id, topic_id = self.parse_target_chat(target_chat_str)
+        sender = profile.user_id
+        target_chat_id, topic_id = self.parse_target_chat(profile.target_chat or str(sender))
         file_path = None
+        reservation = None
         
         try:
             # Try direct copy first
             msg = await app_client.get_messages(chat_id, message_id)
-            custom_caption = self.user_caption_prefs.get(str(sender), "")
-            final_caption = await self._format_caption_with_custom(msg.caption or '', sender, custom_caption)
+            final_caption = await self._format_caption_with_custom(msg.caption or '', profile)
+
+            if msg.media:
+                filename, _, media_type = self.media_processor.get_media_info(msg)
+                copy_clients = self._server_copy_clients(msg, profile, target_chat_id, media_type, filename, None)
+                if copy_clients and await self._try_server_copy(msg, copy_clients, target_chat_id, topic_id, final_caption):
+                    await app.delete_messages(sender, edit_id)
+                    return
 
             if msg.media and not msg.document and not msg.video:
                 # For photos and other simple media
@@ -827,13 +1170,13 @@ class SmartTelegramBot:
                     result = await app_client.send_document(target_chat_id, msg.document.file_id, caption=final_caption, reply_to_message_id=topic_id)
                 
                 if 'result' in locals():
-                    await result.copy(LOG_GROUP)
+                    await self._mirror_to_log(result)
                     await app.delete_messages(sender, edit_id)
                     return
 
             elif msg.text:
                 result = await app_client.copy_message(target_chat_id, chat_id, message_id, reply_to_message_id=topic_id)
-                await result.copy(LOG_GROUP)
+                await self._mirror_to_log(result)
                 await app.delete_messages(sender, edit_id)
                 return
 
@@ -858,14 +1201,17 @@ class SmartTelegramBot:
                     return
 
                 # Download and upload media
-                final_caption = await self._format_caption_with_custom(msg.caption.markdown if msg.caption else "", sender, custom_caption)
+                final_caption = await self._format_caption_with_custom(msg.caption.markdown if msg.caption else "", profile)
                 
-                progress_args = ("Downloading...", edit_msg, time.time())
-                file_path = await userbot.download_media(msg, progress=progress_bar, progress_args=progress_args)
-                file_path = await self.file_ops.process_filename(file_path, sender)
-
                 filename, file_size, media_type = self.media_processor.get_media_info(msg)
 
+                reservation = await self.reserve_disk(file_size, edit_msg, partial=partial_paths(msg, filename)[0])
+                progress_args = ("Downloading...", edit_msg, time.time())
+                file_path = await self.download_media(userbot, msg, filename, file_size, progress_args)
+                reservation.track(file_path)
+                file_path = await self.file_ops.process_filename(file_path, profile)
+                reservation.track(file_path)
+
                 if media_type == "photo":
                     result = await app_client.send_photo(target_chat_id, file_path, caption=final_caption, reply_to_message_id=topic_id)
                 elif file_size > self.config.SIZE_LIMIT:
@@ -878,32 +1224,27 @@ class SmartTelegramBot:
                         await self.file_ops.split_large_file(file_path, app_client, sender, target_chat_id, final_caption, topic_id)
                         return
                     else:
-                        await self.handle_large_file_upload(file_path, sender, edit_msg, final_caption)
+                        await self.handle_large_file_upload(file_path, sender, edit_msg, final_caption, userbot, msg)
                         return
                 else:
-                    upload_method = self.db.get_user_data(sender, "upload_method", "Pyrogram")
-                    if upload_method == "Telethon":
-                        await self.upload_with_telethon(file_path, sender, target_chat_id, final_caption, topic_id, edit_msg)
+                    if profile.upload_method == "Telethon":
+                        await self.upload_with_telethon(file_path, sender, target_chat_id, final_caption, topic_id, edit_msg, None, userbot, msg)
                     else:
-                        await self.upload_with_pyrogram(file_path, sender, target_chat_id, final_caption, topic_id, edit_msg)
+                        await self.upload_with_pyrogram(file_path, sender, target_chat_id, final_caption, topic_id, edit_msg, None, userbot, msg)
 
         except Exception as e:
             print(f"Public message copy error: {e}")
+            raise
         finally:
             if file_path:
                 await self.file_ops._cleanup_file(file_path)
+            if reservation:
+                reservation.release()
 
-    async def _format_caption_with_custom(self, original_caption: str, sender: int, custom_caption: str) -> str:
+    async def _format_caption_with_custom(self, original_caption: str, profile: UserProfile) -> str:
         """Format caption with user preferences"""
-        delete_words = set(self.db.get_user_data(sender, "delete_words", []))
-        replacements = self.db.get_user_data(sender, "replacement_words", {})
-        
-        processed = original_caption
-        for word in delete_words:
-            processed = processed.replace(word, '  ')
-        
-        for word, replace_word in replacements.items():
-            processed = processed.replace(word, replace_word)
+        custom_caption = profile.custom_caption
+        processed = profile.text_rules.apply(original_caption, deleted='  ')
         
         if custom_caption:
             return f"{processed}\n\n__**{custom_caption}**__" if processed else f"__**{custom_caption}**__"
@@ -951,7 +1292,7 @@ async def callback_query_handler(event):
     
     # Upload method selection
     if data == b'uploadmethod':
-        current_method = telegram_bot.db.get_user_data(user_id, "upload_method", "Pyrogram")
+        current_method = await telegram_bot.db.get_user_data(user_id, "upload_method", "Pyrogram")
         pyro_check = " ✅" if current_method == "Pyrogram" else ""
         tele_check = " ✅" if current_method == "Telethon" else ""
         
@@ -968,15 +1309,16 @@ async def callback_query_handler(event):
         )
 
     elif data == b'pyrogram':
-        telegram_bot.db.save_user_data(user_id, "upload_method", "Pyrogram")
+        await telegram_bot.db.save_user_data(user_id, "upload_method", "Pyrogram")
         await event.edit("✅ Upload method set to **Pyrogram v2**")
 
     elif data == b'telethon':
-        telegram_bot.db.save_user_data(user_id, "upload_method", "Telethon")
+        await telegram_bot.db.save_user_data(user_id, "upload_method", "Telethon")
         await event.edit("✅ Upload method set to **SpyLib v1 ⚡**\n\nThanks for helping us test this advanced library!")
 
     # Session management
     elif data == b'logout':
+        await userbot_pool.discard(user_id)
         await odb.remove_session(user_id)
         user_data = await odb.get_data(user_id)
         message = "✅ Logged out successfully!" if user_data and user_data.get("session") is None else "❌ You are not logged in."
@@ -1021,9 +1363,8 @@ async def callback_query_handler(event):
         await event.respond("🖼 **Set Thumbnail**\n\nSend a photo to use as thumbnail for videos:")
 
     elif data == b'remthumb':
-        thumb_path = f'{user_id}.jpg'
-        if os.path.exists(thumb_path):
-            os.remove(thumb_path)
+        if await telegram_bot.get_thumbnail_path(user_id):
+            await telegram_bot.db.save_thumbnail(user_id, None)
             await event.respond('✅ Thumbnail removed successfully!')
         else:
             await event.respond("❌ No thumbnail found to remove.")
@@ -1038,10 +1379,8 @@ async def callback_query_handler(event):
     # Reset all settings
     elif data == b'reset':
         try:
-            success = telegram_bot.db.reset_user_data(user_id)
-            telegram_bot.user_chat_ids.pop(user_id, None)
+            success = await telegram_bot.db.reset_user_data(user_id)
             telegram_bot.user_rename_prefs.pop(str(user_id), None)
-            telegram_bot.user_caption_prefs.pop(str(user_id), None)
             
             # Remove thumbnail
             thumb_path = f"{user_id}.jpg"
@@ -1060,14 +1399,16 @@ async def thumbnail_handler(event):
     """Handle thumbnail upload"""
     user_id = event.sender_id
     if event.photo:
-        temp_path = await event.download_media()
-        thumb_path = f'{user_id}.jpg'
-        
-        if os.path.exists(thumb_path):
-            os.remove(thumb_path)
+        # Kept in MongoDB rather than on this machine, so worker processes use it too
+        data = await event.download_media(file=bytes)
+        legacy_path = f'{user_id}.jpg'
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
         
-        os.rename(temp_path, f'./{user_id}.jpg')
-        await event.respond('✅ Thumbnail saved successfully!')
+        if await telegram_bot.db.save_thumbnail(user_id, data):
+            await event.respond('✅ Thumbnail saved successfully!')
+        else:
+            await event.respond('❌ Could not save the thumbnail. Try again.')
     else:
         await event.respond('❌ Please send a photo. Try again.')
     
@@ -1084,7 +1425,8 @@ async def user_input_handler(event):
         if session_type == 'setchat':
             try:
                 chat_id = event.text.strip()
-                telegram_bot.user_chat_ids[user_id] = chat_id
+                telegram_bot.parse_target_chat(chat_id)
+                await telegram_bot.db.save_user_data(user_id, "target_chat", chat_id)
                 await event.respond(f"✅ Target chat set to: `{chat_id}`")
             except ValueError:
                 await event.respond("❌ Invalid chat ID format!")
@@ -1092,13 +1434,12 @@ async def user_input_handler(event):
         elif session_type == 'setrename':
             rename_tag = event.text.strip()
             telegram_bot.user_rename_prefs[str(user_id)] = rename_tag
-            telegram_bot.db.save_user_data(user_id, "rename_tag", rename_tag)
+            await telegram_bot.db.save_user_data(user_id, "rename_tag", rename_tag)
             await event.respond(f"✅ Rename tag set to: **{rename_tag}**")
         
         elif session_type == 'setcaption':
             custom_caption = event.text.strip()
-            telegram_bot.user_caption_prefs[str(user_id)] = custom_caption
-            telegram_bot.db.save_user_data(user_id, "custom_caption", custom_caption)
+            await telegram_bot.db.save_user_data(user_id, "custom_caption", custom_caption)
             await event.respond(f"✅ Custom caption set to:\n\n**{custom_caption}**")
 
         elif session_type == 'setreplacement':
@@ -1107,14 +1448,14 @@ async def user_input_handler(event):
                 await event.respond("❌ **Invalid format!**\n\nUse: `'OLD_WORD' 'NEW_WORD'`")
             else:
                 old_word, new_word = match.groups()
-                delete_words = set(telegram_bot.db.get_user_data(user_id, "delete_words", []))
+                delete_words = set(await telegram_bot.db.get_user_data(user_id, "delete_words", []))
                 
                 if old_word in delete_words:
                     await event.respond(f"❌ '{old_word}' is in delete list and cannot be replaced.")
                 else:
-                    replacements = telegram_bot.db.get_user_data(user_id, "replacement_words", {})
+                    replacements = await telegram_bot.db.get_user_data(user_id, "replacement_words", {})
                     replacements[old_word] = new_word
-                    telegram_bot.db.save_user_data(user_id, "replacement_words", replacements)
+                    await telegram_bot.db.save_user_data(user_id, "replacement_words", replacements)
                     await event.respond(f"✅ Replacement saved:\n**'{old_word}' → '{new_word}'**")
 
         elif session_type == 'addsession':
@@ -1124,9 +1465,9 @@ async def user_input_handler(event):
                 
         elif session_type == 'deleteword':
             words_to_delete = event.text.split()
-            delete_words = set(telegram_bot.db.get_user_data(user_id, "delete_words", []))
+            delete_words = set(await telegram_bot.db.get_user_data(user_id, "delete_words", []))
             delete_words.update(words_to_delete)
-            telegram_bot.db.save_user_data(user_id, "delete_words", list(delete_words))
+            await telegram_bot.db.save_user_data(user_id, "delete_words", list(delete_words))
             await event.respond(f"✅ Words added to delete list:\n**{', '.join(words_to_delete)}**")
                
         # Clear session after handling
@@ -1141,7 +1482,7 @@ async def lock_channel_handler(event):
     
     try:
         channel_id = int(event.text.split(' ')[1])
-        success = telegram_bot.db.lock_channel(channel_id)
+        success = await telegram_bot.db.lock_channel(channel_id)
         
         if success:
             await event.respond(f"✅ Channel ID `{channel_id}` locked successfully.")
@@ -1153,9 +1494,13 @@ async def lock_channel_handler(event):
         await event.respond(f"❌ Error: {str(e)}")
 
 # Main message handler function (integration point with existing get_msg function)
-async def get_msg(userbot, sender, edit_id, msg_link, i, message):
+async def get_msg(userbot, sender, edit_id, msg_link, i, message, turn=None, profile=None):
     """Main integration function - enhanced version of original get_msg"""
-    await telegram_bot.handle_message_download(userbot, sender, edit_id, msg_link, i, message)
+    await telegram_bot.handle_message_download(userbot, sender, edit_id, msg_link, i, message, turn, profile)
+
+async def load_profile(user_id):
+    """Settings snapshot to reuse across every item of a batch"""
+    return await telegram_bot.load_profile(user_id)
 
 print("✅ Smart Telegram Bot initialized successfully!")
 print(f"📊 Features loaded:")
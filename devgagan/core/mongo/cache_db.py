@@ -0,0 +1,57 @@
+# ---------------------------------------------------
+# File Name: cache_db.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import datetime
+from motor.motor_asyncio import AsyncIOMotorClient as MongoCli
+from config import MONGO_DB
+
+mongo = MongoCli(MONGO_DB)
+db = mongo.file_cache
+db = db.file_cache_db
+
+# Process-local counters, shown in /stats
+cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+async def create_cache_index():
+    await db.create_index("file_unique_id")
+
+
+async def get_cached_file(chat_id, msg_id, file_unique_id):
+    """Find the LOG_GROUP copy of a source message, by source id first and content id second"""
+    data = await db.find_one({"_id": f"{chat_id}:{msg_id}"})
+    if data and data.get("file_unique_id") == file_unique_id:
+        return data
+    if file_unique_id:
+        return await db.find_one({"file_unique_id": file_unique_id})
+    return None
+
+
+async def set_cached_file(chat_id, msg_id, file_unique_id, log_msg_id, file_name, media_type):
+    await db.update_one(
+        {"_id": f"{chat_id}:{msg_id}"},
+        {"$set": {
+            "file_unique_id": file_unique_id,
+            "log_msg_id": log_msg_id,
+            "file_name": file_name,
+            "media_type": media_type,
+            "cached_at": datetime.datetime.utcnow()
+        }},
+        upsert=True
+    )
+
+
+async def remove_cached_log_msg(log_msg_id):
+    """Drop every entry pointing at a LOG_GROUP message that no longer exists"""
+    await db.delete_many({"log_msg_id": log_msg_id})
@@ -0,0 +1,36 @@
+# ---------------------------------------------------
+# File Name: flood_db.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import datetime
+from motor.motor_asyncio import AsyncIOMotorClient as MongoCli
+from config import MONGO_DB
+
+mongo = MongoCli(MONGO_DB)
+db = mongo.ratelimit
+db = db.flood_windows
+
+
+async def create_flood_index():
+    # Windows delete themselves once they are over
+    await db.create_index("until", expireAfterSeconds=0)
+
+
+async def save_flood_window(key, until):
+    """Remember that `key` ("client:method") may not be called before the UTC datetime `until`"""
+    await db.update_one({"_id": key}, {"$max": {"until": until}}, upsert=True)
+
+
+async def load_flood_windows():
+    now = datetime.datetime.utcnow()
+    return {data["_id"]: data["until"] async for data in db.find({"until": {"$gt": now}})}
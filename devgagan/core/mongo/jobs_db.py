@@ -0,0 +1,178 @@
+# ---------------------------------------------------
+# File Name: jobs_db.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import datetime
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from motor.motor_asyncio import AsyncIOMotorClient as MongoCli
+from config import MONGO_DB
+
+mongo = MongoCli(MONGO_DB)
+db = mongo.jobs
+user_leases = db.user_leases
+db = db.batch_jobs
+
+# A job is {"user_id", "links", "status", "next_seq", "items": {"<seq>": status}, "owner",
+# "lease_until", ...}, with item statuses "delivering", "done", "failed" or "skipped". Every
+# item before next_seq is finished; on resume the rest are run again, except "delivering"
+# ones, which may already have reached the user and are skipped instead.
+ACTIVE = ("queued", "running")
+
+
+async def create_job_index():
+    await db.create_index([("status", 1), ("lease_until", 1)])
+    await db.create_index("user_id")
+
+
+async def create_job(user_id, links, freecheck, pin_msg_id, kind="batch"):
+    now = datetime.datetime.utcnow()
+    result = await db.insert_one({
+        "user_id": user_id,
+        "kind": kind,
+        "links": links,
+        "freecheck": freecheck,
+        "pin_msg_id": pin_msg_id,
+        "status": "queued",
+        "next_seq": 0,
+        "items": {},
+        "owner": None,
+        "lease_until": now,
+        "created_at": now,
+        "updated_at": now
+    })
+    return result.inserted_id
+
+
+async def claim_job(job_id, owner, lease_seconds):
+    """Take the job if its lease is free or already ours; returns the job or None"""
+    now = datetime.datetime.utcnow()
+    return await db.find_one_and_update(
+        {"_id": job_id, "status": {"$in": ACTIVE},
+         "$or": [{"lease_until": {"$lt": now}}, {"owner": owner}]},
+        {"$set": {"owner": owner, "status": "running",
+                  "lease_until": now + datetime.timedelta(seconds=lease_seconds), "updated_at": now}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def claim_next_job(owner, lease_seconds, exclude_users=(), prefer_users=()):
+    """Claim any unowned or expired job, oldest first; jobs of `prefer_users` are tried first"""
+    now = datetime.datetime.utcnow()
+    base = {"status": {"$in": ACTIVE}, "$or": [{"lease_until": {"$lt": now}}, {"owner": owner}]}
+    exclude = list(exclude_users)
+    prefer = [user_id for user_id in prefer_users if user_id not in exclude]
+    filters = [{**base, "user_id": {"$in": prefer}}] if prefer else []
+    filters.append({**base, "user_id": {"$nin": exclude}})
+    for query in filters:
+        job = await db.find_one_and_update(
+            query,
+            {"$set": {"owner": owner, "status": "running",
+                      "lease_until": now + datetime.timedelta(seconds=lease_seconds), "updated_at": now}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            return job
+    return None
+
+
+async def release_job(job_id, owner):
+    """Hand a claimed job back to the queue without running it"""
+    await db.update_one(
+        {"_id": job_id, "owner": owner, "status": "running"},
+        {"$set": {"status": "queued", "owner": None, "lease_until": datetime.datetime.utcnow()}}
+    )
+
+
+async def renew_lease(job_id, owner, lease_seconds):
+    """Extend our lease; False means the job was taken over or finished elsewhere"""
+    now = datetime.datetime.utcnow()
+    result = await db.update_one(
+        {"_id": job_id, "owner": owner, "status": "running"},
+        {"$set": {"lease_until": now + datetime.timedelta(seconds=lease_seconds), "updated_at": now}}
+    )
+    return result.matched_count == 1
+
+
+async def mark_item(job_id, seq, status, next_seq):
+    await db.update_one(
+        {"_id": job_id},
+        {"$set": {f"items.{seq}": status, "updated_at": datetime.datetime.utcnow()},
+         "$max": {"next_seq": next_seq}}
+    )
+
+
+async def mark_delivering(job_id, owner, seq, next_seq):
+    """Mark an item as being delivered, unless the job was cancelled or taken over meanwhile"""
+    result = await db.update_one(
+        {"_id": job_id, "owner": owner, "status": "running"},
+        {"$set": {f"items.{seq}": "delivering", "updated_at": datetime.datetime.utcnow()},
+         "$max": {"next_seq": next_seq}}
+    )
+    return result.matched_count == 1
+
+
+async def finish_job(job_id, owner, status):
+    """Close the job as done, cancelled or failed and release the lease"""
+    await db.update_one(
+        {"_id": job_id, "owner": owner},
+        {"$set": {"status": status, "owner": None, "updated_at": datetime.datetime.utcnow()}}
+    )
+
+
+async def cancel_user_jobs(user_id):
+    result = await db.update_many(
+        {"user_id": user_id, "status": {"$in": ACTIVE}},
+        {"$set": {"status": "cancelled", "updated_at": datetime.datetime.utcnow()}}
+    )
+    return result.modified_count
+
+
+async def has_active_job(user_id):
+    return await db.count_documents({"user_id": user_id, "status": {"$in": ACTIVE}}, limit=1) > 0
+
+
+async def job_counts():
+    counts = {"queued": 0, "running": 0}
+    async for row in db.aggregate([{"$match": {"status": {"$in": ACTIVE}}},
+                                   {"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    return counts
+
+
+# One lease per user across all processes, so a user's jobs never run on two workers at once
+async def acquire_user_lease(user_id, owner, lease_seconds):
+    """Take or extend the user's lease; False while another worker holds it"""
+    now = datetime.datetime.utcnow()
+    try:
+        await user_leases.update_one(
+            {"_id": user_id, "$or": [{"until": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "until": now + datetime.timedelta(seconds=lease_seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def release_user_lease(user_id, owner):
+    await user_leases.delete_one({"_id": user_id, "owner": owner})
+
+
+async def leased_users(exclude_owner=None):
+    """Users whose lease is currently held, optionally ignoring our own"""
+    query = {"until": {"$gt": datetime.datetime.utcnow()}}
+    if exclude_owner:
+        query["owner"] = {"$ne": exclude_owner}
+    return [data["_id"] async for data in user_leases.find(query, {"_id": 1})]
@@ -12,13 +12,31 @@
 # License: MIT License
 # ---------------------------------------------------
 
+import asyncio
 import datetime
+import heapq
 from motor.motor_asyncio import AsyncIOMotorClient as MongoCli
-from config import MONGO_DB
+from config import MONGO_DB, PREMIUM_RESYNC_INTERVAL
  
 mongo = MongoCli(MONGO_DB)
 db = mongo.premium
 db = db.premium_db
+
+# In-process premium index (user_id -> expire_date), updated by every write below
+# and kept in sync with other processes by sync_premium_index()
+premium_index = {}
+_index_lock = asyncio.Lock()
+_index_loaded = False
+
+# Min-heap of (expire_date, user_id); entries no longer matching premium_index are stale and skipped
+_expiry_heap = []
+_expiry_wakeup = asyncio.Event()
+
+def _track_expiry(user_id, expire_date):
+    premium_index[user_id] = expire_date
+    if isinstance(expire_date, datetime.datetime):
+        heapq.heappush(_expiry_heap, (expire_date, user_id))
+        _expiry_wakeup.set()
  
 async def add_premium(user_id, expire_date):
     data = await check_premium(user_id)
@@ -26,24 +44,130 @@ async def add_premium(user_id, expire_date):
         await db.update_one({"_id": user_id}, {"$set": {"expire_date": expire_date}})
     else:
         await db.insert_one({"_id": user_id, "expire_date": expire_date})
+    _track_expiry(user_id, expire_date)
  
 async def remove_premium(user_id):
     await db.delete_one({"_id": user_id})
+    premium_index.pop(user_id, None)
  
 async def check_premium(user_id):
     return await db.find_one({"_id": user_id})
  
-async def premium_users():
-    id_list = []
-    async for data in db.find():
-        id_list.append(data["_id"])
-    return id_list
+async def load_premium_index():
+    global _index_loaded
+    async with _index_lock:
+        fresh = {}
+        async for data in db.find({}, {"expire_date": 1}):
+            fresh[data["_id"]] = data.get("expire_date")
+        premium_index.clear()
+        _expiry_heap.clear()
+        for user_id, expire_date in fresh.items():
+            _track_expiry(user_id, expire_date)
+        _index_loaded = True
+
+async def is_premium(user_id):
+    """O(1) premium lookup; only the very first call reads the database"""
+    if not _index_loaded:
+        await load_premium_index()
+    if user_id not in premium_index:
+        return False
+    return _active(premium_index[user_id], datetime.datetime.now())
+
+async def count_premium():
+    """Users whose plan has not expired yet, counted like is_premium decides"""
+    if not _index_loaded:
+        await load_premium_index()
+    now = datetime.datetime.now()
+    return sum(1 for expire_date in premium_index.values() if _active(expire_date, now))
+
+def _active(expire_date, now):
+    # A plan stays in the index until the expiry scheduler removes it, so check the date here too
+    if isinstance(expire_date, datetime.datetime):
+        return expire_date > now
+    return True
+
+async def sync_premium_index():
+    """Follow premium_db writes from other processes, or reload periodically on a standalone server"""
+    while True:
+        try:
+            async with db.watch(full_document="updateLookup") as stream:
+                # Catch up on anything written before the stream was opened
+                await load_premium_index()
+                async for change in stream:
+                    user_id = change["documentKey"]["_id"]
+                    if change["operationType"] == "delete":
+                        premium_index.pop(user_id, None)
+                    elif change.get("fullDocument"):
+                        _track_expiry(user_id, change["fullDocument"].get("expire_date"))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if getattr(e, "code", None) != 40573:  # 40573: no change streams without a replica set
+                print(f"Premium change stream error: {e}")
+                await asyncio.sleep(5)
+                continue
+            break
+
+    while True:
+        await asyncio.sleep(PREMIUM_RESYNC_INTERVAL)
+        try:
+            await load_premium_index()
+        except Exception as e:
+            print(f"Premium index reload failed: {e}")
  
-async def check_and_remove_expired_users():
-    current_time = datetime.datetime.utcnow()
-    async for data in db.find():
-        expire_date = data.get("expire_date")
-        if expire_date and expire_date < current_time:
-            await remove_premium(data["_id"])
-            print(f"Removed user {data['_id']} due to expired plan.")
- 
\ No newline at end of file
+async def create_premium_index():
+    await db.create_index("expire_date")
+
+async def remove_expired_users(now=None):
+    """Delete every plan due by `now` with one indexed range query and one delete_many"""
+    # /add stores naive local times, so compare against the same clock
+    now = now or datetime.datetime.now()
+    expired = [data["_id"] async for data in db.find({"expire_date": {"$lte": now}}, {"_id": 1})]
+    if expired:
+        await db.delete_many({"_id": {"$in": expired}, "expire_date": {"$lte": now}})
+    for user_id in expired:
+        premium_index.pop(user_id, None)
+    return expired
+
+async def run_expiry_scheduler(on_expired=None):
+    """Sleep until the next plan expires instead of polling the collection.
+
+    `on_expired(user_ids)` is awaited with the users removed in each round.
+    """
+    if not _index_loaded:
+        await load_premium_index()
+    while True:
+        now = datetime.datetime.now()
+        while _expiry_heap and premium_index.get(_expiry_heap[0][1]) != _expiry_heap[0][0]:
+            heapq.heappop(_expiry_heap)
+
+        if _expiry_heap and _expiry_heap[0][0] <= now:
+            try:
+                expired = await remove_expired_users(now)
+            except Exception as e:
+                print(f"Premium expiry failed: {e}")
+                await asyncio.sleep(30)
+                continue
+            # Drop due entries even if another process already removed the documents
+            while _expiry_heap and _expiry_heap[0][0] <= now:
+                expire_date, user_id = heapq.heappop(_expiry_heap)
+                if premium_index.get(user_id) == expire_date:
+                    premium_index.pop(user_id, None)
+            for user_id in expired:
+                print(f"Removed user {user_id} due to expired plan.")
+            if expired and on_expired:
+                try:
+                    await on_expired(expired)
+                except Exception as e:
+                    print(f"Expiry notification failed: {e}")
+            continue
+
+        # Wake up for the next expiry, a new plan, or hourly to absorb clock changes
+        timeout = 3600
+        if _expiry_heap:
+            timeout = min(timeout, max((_expiry_heap[0][0] - now).total_seconds(), 0.1))
+        _expiry_wakeup.clear()
+        try:
+            await asyncio.wait_for(_expiry_wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
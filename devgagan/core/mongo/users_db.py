@@ -20,6 +20,10 @@ mongo = MongoCli(MONGO_DB)
 db = mongo.users
 db = db.users_db
 
+# Users known to be stored; returning users cost no database call at all. Other processes
+# add users too, so a miss still asks the database.
+seen_users = set()
+
 
 async def get_users():
   user_list = []
@@ -28,27 +32,42 @@ async def get_users():
   return user_list
 
 
+async def count_users():
+  return await db.users.count_documents({"user": {"$gt": 0}})
+
+
+async def create_user_index():
+  try:
+    await db.users.create_index("user", unique=True)
+  except Exception as e:
+    # Older deployments may hold duplicates; lookups still use the set below
+    print(f"Could not create unique users index: {e}")
+
+
+async def load_seen_users():
+  async for user in db.users.find({"user": {"$gt": 0}}, {"user": 1, "_id": 0}):
+    seen_users.add(user["user"])
+
+
 async def get_user(user):
-  users = await get_users()
-  if user in users:
+  if user in seen_users:
     return True
-  else:
+  if await db.users.find_one({"user": user}, {"_id": 1}) is None:
     return False
+  seen_users.add(user)
+  return True
 
 async def add_user(user):
-  users = await get_users()
-  if user in users:
+  if user in seen_users:
     return
-  else:
-    await db.users.insert_one({"user": user})
+  # Idempotent, so concurrent messages from a new user cannot insert duplicates
+  await db.users.update_one({"user": user}, {"$setOnInsert": {"user": user}}, upsert=True)
+  seen_users.add(user)
 
 
 async def del_user(user):
-  users = await get_users()
-  if not user in users:
-    return
-  else:
-    await db.users.delete_one({"user": user})
+  await db.users.delete_one({"user": user})
+  seen_users.discard(user)
     
 
 
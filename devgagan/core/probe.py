@@ -0,0 +1,106 @@
+# ---------------------------------------------------
+# File Name: probe.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import PROBE_TIMEOUT
+
+DEFAULT_METADATA = {'width': 1, 'height': 1, 'duration': 1, 'codec': None}
+
+
+class MediaProbe:
+    """Reads width/height/duration/codec with an `ffprobe` subprocess, off the event loop.
+
+    Results are memoized per (path, mtime, size), so the uploaders and the thumbnail step can
+    ask for the same file as often as they like; concurrent requests for one file share a
+    single ffprobe run. A probe that fails or exceeds `timeout` yields DEFAULT_METADATA.
+    """
+    def __init__(self, timeout: float = 15.0, max_entries: int = 512):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._results: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._running: Dict[Tuple, asyncio.Future] = {}
+
+    async def probe(self, path: str) -> Dict:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return dict(DEFAULT_METADATA)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            return dict(result)
+        running = self._running.get(key)
+        if running is None:
+            running = self._running[key] = asyncio.ensure_future(self._run(path))
+            running.add_done_callback(lambda _: self._running.pop(key, None))
+            running.add_done_callback(lambda task: self._store(key, task))
+        result = await asyncio.shield(running)
+        return dict(result or DEFAULT_METADATA)
+
+    def _store(self, key: Tuple, task: asyncio.Future):
+        # Failures are not remembered, the next upload of the file tries again
+        if task.cancelled() or task.exception() is not None or task.result() is None:
+            return
+        self._results[key] = task.result()
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    async def _run(self, path: str) -> Optional[Dict]:
+        process = None
+        try:
+            process = await asyncio.create_subprocess_exec(
+                "ffprobe", "-v", "error", "-print_format", "json",
+                "-show_entries", "format=duration:stream=codec_type,codec_name,width,height,duration",
+                path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            stdout, _ = await asyncio.wait_for(process.communicate(), self.timeout)
+            return _parse(json.loads(stdout or b"{}"))
+        except asyncio.TimeoutError:
+            print(f"ffprobe timed out after {self.timeout}s on {path}")
+        except Exception as e:
+            print(f"Error in probe for {path}: {e}")
+        finally:
+            if process and process.returncode is None:
+                process.kill()
+                await process.wait()
+        return None
+
+
+def _parse(info: Dict) -> Dict:
+    streams = info.get("streams") or []
+    video: Optional[Dict] = next((s for s in streams if s.get("codec_type") == "video"), None)
+    duration = (info.get("format") or {}).get("duration") or (video or {}).get("duration")
+    try:
+        duration = round(float(duration))
+    except (TypeError, ValueError):
+        duration = 0
+    if not video:
+        return {**DEFAULT_METADATA, 'duration': duration or DEFAULT_METADATA['duration']}
+    return {
+        'width': video.get("width") or DEFAULT_METADATA['width'],
+        'height': video.get("height") or DEFAULT_METADATA['height'],
+        'duration': duration or DEFAULT_METADATA['duration'],
+        'codec': video.get("codec_name")
+    }
+
+
+media_probe = MediaProbe(timeout=PROBE_TIMEOUT)
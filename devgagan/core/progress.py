@@ -0,0 +1,147 @@
+# ---------------------------------------------------
+# File Name: progress.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from pyrogram.errors import FloodWait, MessageNotModified
+from telethon.errors import FloodWaitError
+from devgagan.core.ratelimit import rate_limiter
+from config import PROGRESS_INTERVAL, PROGRESS_EDITS_PER_SECOND
+
+
+@dataclass
+class _Job:
+    message: Any
+    render: Callable[..., str]
+    args: Tuple = ()
+    final: bool = False
+    dirty: bool = True
+    last_edit: float = 0.0
+    updated: float = field(default_factory=time.monotonic)
+    last_text: Optional[str] = None
+
+
+def _message_key(message) -> Hashable:
+    chat_id = getattr(message, "chat_id", None) or getattr(getattr(message, "chat", None), "id", None)
+    return chat_id, message.id
+
+
+class ProgressHub:
+    """Turns progress reports from every transfer into rate-limited status message edits.
+
+    Publishing only stores the latest state, so transfers can report on every chunk. One
+    scheduler task renders and edits each status message at most once per `interval`,
+    spends a shared budget of `edits_per_second` across all messages, and pauses every
+    edit while a FloodWait is active.
+    """
+    def __init__(self, interval: float = 5.0, edits_per_second: float = 10.0, tick: float = 0.5,
+                 stale_after: float = 120.0):
+        self.interval = interval
+        self.edits_per_second = edits_per_second
+        self.tick = tick
+        self.stale_after = stale_after
+        self._jobs: Dict[Hashable, _Job] = {}
+        self._tokens = edits_per_second
+        self._refilled = time.monotonic()
+        self._blocked_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.edits = 0
+        self.coalesced = 0
+        self.flood_waits = 0
+
+    def publish(self, message, render: Callable[..., str], *args, final: bool = False):
+        """Record the newest state of `message`; `render(*args)` builds the text when it is edited"""
+        if message is None:
+            return
+        key = _message_key(message)
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = _Job(message, render)
+        elif job.dirty:
+            self.coalesced += 1
+        job.message, job.render, job.args = message, render, args
+        job.final = job.final or final
+        job.dirty = True
+        job.updated = time.monotonic()
+        if not self._task or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def reply_proxy(self, message) -> "_ReplyProxy":
+        """Stand-in for libraries that edit a reply message themselves (SpyLib fast_upload)"""
+        return _ReplyProxy(self, message)
+
+    def stats(self) -> Dict[str, int]:
+        return {"active": len(self._jobs), "edits": self.edits, "coalesced": self.coalesced,
+                "flood_waits": self.flood_waits}
+
+    def _take_token(self, now: float) -> bool:
+        self._tokens = min(self.edits_per_second, self._tokens + (now - self._refilled) * self.edits_per_second)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    async def _run(self):
+        while self._jobs:
+            await asyncio.sleep(self.tick)
+            now = time.monotonic()
+            if now < self._blocked_until:
+                continue
+            # Longest-waiting messages first, so a tight budget is shared fairly
+            for key, job in sorted(self._jobs.items(), key=lambda item: item[1].last_edit):
+                if not job.dirty:
+                    if now - job.updated > self.stale_after:
+                        del self._jobs[key]
+                    continue
+                if not job.final and now - job.last_edit < self.interval:
+                    continue
+                if not self._take_token(now):
+                    break
+                job.dirty = False
+                job.last_edit = now
+                try:
+                    text = job.render(*job.args)
+                    if text != job.last_text:
+                        # A FloodWait must reach the backoff below rather than stall every progress bar
+                        with rate_limiter.no_wait():
+                            await job.message.edit(text)
+                        job.last_text = text
+                        self.edits += 1
+                except (FloodWait, FloodWaitError) as e:
+                    self.flood_waits += 1
+                    self._blocked_until = time.monotonic() + (getattr(e, "value", None) or getattr(e, "seconds", 0))
+                    job.dirty = True
+                    break
+                except MessageNotModified:
+                    pass
+                except Exception:
+                    # Deleted or inaccessible status message; the transfer itself is unaffected
+                    job.final = True
+                if job.final and not job.dirty:
+                    del self._jobs[key]
+
+
+class _ReplyProxy:
+    def __init__(self, hub: ProgressHub, message):
+        self.hub = hub
+        self.message = message
+
+    async def edit(self, text: str, *args, **kwargs):
+        self.hub.publish(self.message, str, text)
+
+
+progress_hub = ProgressHub(PROGRESS_INTERVAL, PROGRESS_EDITS_PER_SECOND)
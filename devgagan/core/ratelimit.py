@@ -0,0 +1,251 @@
+# ---------------------------------------------------
+# File Name: ratelimit.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import contextvars
+import datetime
+import time
+from contextlib import contextmanager
+from typing import Dict, Hashable, Optional, Tuple
+from pyrogram.errors import FloodWait
+from telethon.errors import FloodWaitError
+from devgagan.core.mongo import flood_db
+from config import RPC_CLIENT_RATE, RPC_PEER_RATE, FLOOD_MAX_WAIT
+
+# File transfer parts are already bounded by max_concurrent_transmissions and must not queue here
+_UNLIMITED = {"SaveFilePart", "SaveBigFilePart", "GetFile", "UploadFile", "UploadGetFile", "GetCdnFile"}
+# Telegram limits how fast messages go into one chat, not just per account
+_PER_PEER = ("Send", "Edit", "Forward")
+# Set by RateLimiter.no_wait() for callers that would rather get the FloodWait than sleep
+_no_wait = contextvars.ContextVar("ratelimit_no_wait", default=False)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def delay(self) -> float:
+        """Take a token and return how long the caller has to wait for it"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def idle(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class RateLimiter:
+    """Queues calls per client, per (client, method) and per (client, peer), and learns from FloodWait.
+
+    A FloodWait opens a wait window on that client; later calls sleep until it closes instead
+    of hitting Telegram again, and the rate is halved (it recovers slowly on success). Send,
+    edit and forward floods are scoped to the chat they hit, everything else to the method.
+    Windows are stored in MongoDB so a restart does not forget them. Windows longer than
+    `max_wait`, or any window inside `no_wait()`, are raised to the caller right away.
+    """
+    def __init__(self, client_rate: float = 30.0, peer_rate: float = 1.0, method_rate: float = 20.0,
+                 max_wait: float = 300.0):
+        self.client_rate = client_rate
+        self.peer_rate = peer_rate
+        self.method_rate = method_rate
+        self.max_wait = max_wait
+        self._buckets: Dict[Hashable, TokenBucket] = {}
+        self._windows: Dict[str, float] = {}  # "client:method[:peer]" -> wall-clock end of the wait
+        self.queued = 0
+        self.flood_waits = 0
+
+    async def load(self):
+        try:
+            windows = await flood_db.load_flood_windows()
+        except Exception as e:
+            print(f"Could not load flood windows: {e}")
+            return
+        for key, until in windows.items():
+            self._windows[key] = until.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+    def _bucket(self, key: Hashable, rate: float, burst: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) > 20000:
+                for stale in [k for k, b in self._buckets.items() if b.idle()]:
+                    del self._buckets[stale]
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    @contextmanager
+    def no_wait(self):
+        """Calls made inside raise FloodWait at once instead of sleeping through a window"""
+        token = _no_wait.set(True)
+        try:
+            yield
+        finally:
+            _no_wait.reset(token)
+
+    def wait_limit(self) -> float:
+        """Longest FloodWait the current caller is willing to sleep through"""
+        return 0.0 if _no_wait.get() else self.max_wait
+
+    @staticmethod
+    def _window_key(client: str, method: str, peer: Optional[Hashable] = None) -> str:
+        if peer is not None and method.startswith(_PER_PEER):
+            return f"{client}:{method}:{peer[1] if isinstance(peer, tuple) else peer}"
+        return f"{client}:{method}"
+
+    def window(self, client: str, method: str, peer: Optional[Hashable] = None) -> float:
+        """Seconds left on the wait window for this method (in this chat, for per-chat methods)"""
+        key = self._window_key(client, method, peer)
+        until = self._windows.get(key)
+        if until is None:
+            return 0.0
+        left = until - time.time()
+        if left <= 0:
+            del self._windows[key]
+            return 0.0
+        return left
+
+    async def acquire(self, client: str, method: str, peer: Optional[Hashable] = None):
+        """Wait until the call may be sent; returns the remaining window if it is too long to wait"""
+        waited = self.window(client, method, peer)
+        if waited > self.wait_limit():
+            return waited
+        delay = max(
+            waited,
+            self._bucket((client,), self.client_rate, self.client_rate).delay(),
+            self._bucket((client, method), self.method_rate, self.method_rate).delay()
+        )
+        if peer is not None and method.startswith(_PER_PEER):
+            delay = max(delay, self._bucket((client, peer), self.peer_rate, 5).delay())
+        if delay > 0:
+            self.queued += 1
+            await asyncio.sleep(delay)
+        return 0.0
+
+    def _flood_bucket(self, client: str, method: str, peer: Optional[Hashable]) -> TokenBucket:
+        if peer is not None and method.startswith(_PER_PEER):
+            return self._bucket((client, peer), self.peer_rate, 5)
+        return self._bucket((client, method), self.method_rate, self.method_rate)
+
+    def success(self, client: str, method: str, peer: Optional[Hashable] = None):
+        bucket = self._buckets.get((client, peer) if peer is not None and method.startswith(_PER_PEER) else (client, method))
+        if bucket and bucket.rate < bucket.base_rate:
+            bucket.rate = min(bucket.base_rate, bucket.rate * 1.02)
+
+    def flood(self, client: str, method: str, seconds: float, peer: Optional[Hashable] = None):
+        self.flood_waits += 1
+        key = self._window_key(client, method, peer)
+        until = time.time() + seconds
+        if until <= self._windows.get(key, 0):
+            return
+        self._windows[key] = until
+        bucket = self._flood_bucket(client, method, peer)
+        bucket.rate = max(0.05, bucket.rate / 2)
+        asyncio.get_running_loop().create_task(self._persist(key, until))
+
+    async def _persist(self, key: str, until: float):
+        try:
+            await flood_db.save_flood_window(key, datetime.datetime.utcfromtimestamp(until))
+        except Exception as e:
+            print(f"Could not store flood window {key}: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        now = time.time()
+        return {
+            "windows": sum(1 for until in self._windows.values() if until > now),
+            "queued": self.queued,
+            "flood_waits": self.flood_waits
+        }
+
+
+def _method_name(request) -> str:
+    name = type(request).__name__
+    return name[:-7] if name.endswith("Request") else name
+
+
+def _peer_key(request) -> Optional[Tuple[str, int]]:
+    peer = getattr(request, "peer", None)
+    for attr in ("channel_id", "chat_id", "user_id"):
+        value = getattr(peer, attr, None)
+        if value is not None:
+            return attr, value
+    return None
+
+
+def install_pyrogram(client, name: str, limiter: "RateLimiter" = None):
+    """Route every `client.invoke` (all high-level pyrogram methods use it) through the limiter"""
+    limiter = limiter or rate_limiter
+    invoke = client.invoke
+
+    async def limited_invoke(query, *args, **kwargs):
+        method = _method_name(query)
+        if method in _UNLIMITED:
+            return await invoke(query, *args, **kwargs)
+        peer = _peer_key(query)
+        if _no_wait.get() and len(args) < 3:
+            # Stop pyrogram's own session from sleeping through short waits as well
+            kwargs.setdefault("sleep_threshold", 0)
+        for attempt in range(3):
+            left = await limiter.acquire(name, method, peer)
+            if left:
+                raise FloodWait(value=int(left) + 1)
+            try:
+                result = await invoke(query, *args, **kwargs)
+            except FloodWait as e:
+                limiter.flood(name, method, e.value, peer)
+                if e.value > limiter.wait_limit() or attempt == 2:
+                    raise
+                continue
+            limiter.success(name, method, peer)
+            return result
+
+    client.invoke = limited_invoke
+    return client
+
+
+def install_telethon(client, name: str, limiter: "RateLimiter" = None):
+    """Same for Telethon, whose requests all pass through `client._call`"""
+    limiter = limiter or rate_limiter
+    call = client._call
+
+    async def limited_call(sender, request, ordered=False, flood_sleep_threshold=None):
+        if isinstance(request, (list, tuple)) or _method_name(request) in _UNLIMITED:
+            return await call(sender, request, ordered=ordered, flood_sleep_threshold=flood_sleep_threshold)
+        method = _method_name(request)
+        peer = _peer_key(request)
+        if _no_wait.get():
+            flood_sleep_threshold = 0
+        for attempt in range(3):
+            left = await limiter.acquire(name, method, peer)
+            if left:
+                raise FloodWaitError(request=request, capture=int(left) + 1)
+            try:
+                result = await call(sender, request, ordered=ordered, flood_sleep_threshold=flood_sleep_threshold)
+            except FloodWaitError as e:
+                limiter.flood(name, method, e.seconds, peer)
+                if e.seconds > limiter.wait_limit() or attempt == 2:
+                    raise
+                continue
+            limiter.success(name, method, peer)
+            return result
+
+    client._call = limited_call
+    return client
+
+
+rate_limiter = RateLimiter(client_rate=RPC_CLIENT_RATE, peer_rate=RPC_PEER_RATE, max_wait=FLOOD_MAX_WAIT)
@@ -0,0 +1,145 @@
+# ---------------------------------------------------
+# File Name: relay.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import inspect
+import math
+from hashlib import md5
+from typing import Optional, Callable
+from pyrogram import raw, types, utils
+from pyrogram.enums import ParseMode
+
+
+class StreamRelay:
+    """Diskless relay: pipe a userbot download stream straight into a bot upload"""
+    PART_SIZE = 512 * 1024  # Upload part size accepted by upload.saveBigFilePart
+    BIG_FILE_SIZE = 10 * 1024 * 1024  # Telegram threshold for "big" uploads
+
+    def __init__(self, buffer_bytes: int = 8 * 1024 * 1024, workers: int = 4):
+        self.buffer_parts = max(1, buffer_bytes // self.PART_SIZE)
+        self.workers = max(1, workers)
+
+    async def upload(self, userbot, client, msg, file_size: int, file_name: str,
+                     progress: Optional[Callable] = None, progress_args: tuple = ()):
+        """Upload the media of `msg` through `client` while it is still being downloaded"""
+        if not file_size:
+            raise ValueError("Relay needs a known file size")
+
+        is_big = file_size > self.BIG_FILE_SIZE
+        total_parts = int(math.ceil(file_size / self.PART_SIZE))
+        file_id = client.rnd_id()
+        checksum = None if is_big else md5()
+        queue: asyncio.Queue = asyncio.Queue(self.buffer_parts)
+        uploaded = 0
+
+        async def producer():
+            buffer = bytearray()
+            part = 0
+            async for chunk in userbot.stream_media(msg):
+                buffer.extend(chunk)
+                while len(buffer) >= self.PART_SIZE:
+                    await queue.put((part, bytes(buffer[:self.PART_SIZE])))
+                    del buffer[:self.PART_SIZE]
+                    part += 1
+            if buffer:
+                await queue.put((part, bytes(buffer)))
+                part += 1
+            if part != total_parts:
+                raise ValueError(f"Relay stream ended after {part}/{total_parts} parts")
+
+        async def worker():
+            nonlocal uploaded
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                part, data = item
+                if checksum is not None:
+                    # Small files are uploaded by a single worker, so parts arrive in order
+                    checksum.update(data)
+                if is_big:
+                    rpc = raw.functions.upload.SaveBigFilePart(
+                        file_id=file_id, file_part=part, file_total_parts=total_parts, bytes=data
+                    )
+                else:
+                    rpc = raw.functions.upload.SaveFilePart(file_id=file_id, file_part=part, bytes=data)
+                if not await client.invoke(rpc):
+                    raise ValueError(f"Telegram rejected relay part {part}")
+                uploaded += len(data)
+                if progress:
+                    result = progress(min(uploaded, file_size), file_size, *progress_args)
+                    if inspect.isawaitable(result):
+                        await result
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.workers if is_big else 1)]
+        try:
+            await producer()
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+        if is_big:
+            return raw.types.InputFileBig(id=file_id, parts=total_parts, name=file_name)
+        return raw.types.InputFile(id=file_id, parts=total_parts, name=file_name, md5_checksum=checksum.hexdigest())
+
+    async def send(self, userbot, client, msg, chat_id: int, file_name: str, file_size: int, media_type: str,
+                   caption: Optional[str] = None, topic_id: Optional[int] = None, thumb: Optional[str] = None,
+                   progress: Optional[Callable] = None, progress_args: tuple = ()):
+        """Relay the media of `msg` to `chat_id` and return the sent message"""
+        file = await self.upload(userbot, client, msg, file_size, file_name, progress, progress_args)
+        attributes = [raw.types.DocumentAttributeFilename(file_name=file_name)]
+        mime_type = "application/zip"
+
+        if media_type == "video" and msg.video:
+            mime_type = msg.video.mime_type or "video/mp4"
+            attributes.append(raw.types.DocumentAttributeVideo(
+                duration=msg.video.duration or 0, w=msg.video.width or 0, h=msg.video.height or 0,
+                supports_streaming=True
+            ))
+        elif media_type == "audio" and msg.audio:
+            mime_type = msg.audio.mime_type or "audio/mpeg"
+            attributes.append(raw.types.DocumentAttributeAudio(
+                duration=msg.audio.duration or 0, title=msg.audio.title, performer=msg.audio.performer
+            ))
+        elif msg.document:
+            mime_type = msg.document.mime_type or mime_type
+
+        media = raw.types.InputMediaUploadedDocument(
+            file=file,
+            mime_type=mime_type,
+            attributes=attributes,
+            force_file=True if media_type == "document" else None,
+            thumb=await client.save_file(thumb) if thumb else None
+        )
+        r = await client.invoke(raw.functions.messages.SendMedia(
+            peer=await client.resolve_peer(chat_id),
+            media=media,
+            random_id=client.rnd_id(),
+            reply_to=await utils.get_reply_to(client, chat_id, reply_to_message_id=topic_id),
+            **await utils.parse_text_entities(client, caption or "", ParseMode.MARKDOWN, None)
+        ))
+
+        for update in r.updates:
+            if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+                return await types.Message._parse(
+                    client, update.message,
+                    {u.id: u for u in r.users},
+                    {c.id: c for c in r.chats}
+                )
+        raise ValueError("Relay upload sent no message")
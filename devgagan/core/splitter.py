@@ -0,0 +1,119 @@
+# ---------------------------------------------------
+# File Name: splitter.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import io
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple
+from devgagan.core.batch import OrderedGate
+
+
+class FileSlice(io.RawIOBase):
+    """Read-only, seekable view of `length` bytes of a file starting at `offset`.
+
+    Pyrogram uploads file objects by seeking to the end for the size and then reading
+    512 KiB parts, so a slice can be uploaded as a part without being copied anywhere.
+    """
+    def __init__(self, path: str, offset: int, length: int, name: str):
+        super().__init__()
+        self._fp = open(path, "rb")
+        self._offset = offset
+        self._length = length
+        self._pos = 0
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self._length
+        self._pos = max(0, min(pos, self._length))
+        return self._pos
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self._length - self._pos)
+        if size <= 0:
+            return 0
+        self._fp.seek(self._offset + self._pos)
+        read = self._fp.readinto(memoryview(buffer)[:size])
+        self._pos += read
+        return read
+
+    def close(self):
+        if not self.closed:
+            self._fp.close()
+        super().close()
+
+
+def iter_file_slices(file_path: str, part_size: int) -> Iterator[Tuple[int, FileSlice]]:
+    """Yield `(part_number, slice)` views covering the whole file, named like `name.part000.ext`"""
+    path = Path(file_path)
+    file_size = os.path.getsize(file_path)
+    for part_number, offset in enumerate(range(0, file_size, part_size)):
+        name = f"{path.stem}.part{str(part_number).zfill(3)}{path.suffix}"
+        yield part_number, FileSlice(file_path, offset, min(part_size, file_size - offset), name)
+
+
+async def upload_split_parts(client, file_path: str, part_size: int, chat_id: int, caption: Optional[str],
+                             log_chat, topic_id: Optional[int] = None, workers: int = 2,
+                             progress: Optional[Callable] = None, progress_header: str = ""):
+    """Upload the parts of a file in parallel and deliver the "Part: N" messages in order.
+
+    Up to `workers` parts are uploaded at once into `log_chat`; each part is then copied to
+    `chat_id` as soon as every earlier part has been delivered, so the whole file takes
+    about as long as its slowest part instead of the sum of all parts.
+    """
+    gate = OrderedGate()
+    slots = asyncio.Semaphore(max(1, workers))
+
+    async def upload_part(part_number: int, part: FileSlice):
+        try:
+            async with slots:
+                part_caption = f"{caption}\n\n**Part: {part_number + 1}**" if caption else f"**Part: {part_number + 1}**"
+                edit_msg = await client.send_message(chat_id, f"⬆️ Uploading part {part_number + 1}...")
+                with part:
+                    log_msg = await client.send_document(
+                        log_chat,
+                        document=part,
+                        file_name=part.name,
+                        caption=part_caption,
+                        progress=progress,
+                        progress_args=(progress_header, edit_msg, time.time())
+                    )
+
+            async with gate.turn(part_number):
+                await client.copy_message(chat_id, log_chat, log_msg.id, reply_to_message_id=topic_id)
+                await edit_msg.delete()
+        finally:
+            part.close()
+            await gate.complete(part_number)
+
+    results = await asyncio.gather(
+        *(upload_part(part_number, part) for part_number, part in iter_file_slices(file_path, part_size)),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
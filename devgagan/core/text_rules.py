@@ -0,0 +1,82 @@
+# ---------------------------------------------------
+# File Name: text_rules.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import re
+from typing import Dict, Iterable, Optional
+
+
+class TextRules:
+    """A user's delete and replace words compiled into one alternation regex.
+
+    Applying the rules is a single left-to-right pass; at each position the longest
+    matching word wins. A word that is both deleted and replaced is deleted.
+    """
+    def __init__(self, delete_words: Iterable[str] = (), replacements: Optional[Dict[str, str]] = None):
+        self._mapping: Dict[str, Optional[str]] = {word: new for word, new in (replacements or {}).items() if word}
+        for word in delete_words:
+            if word:
+                self._mapping[word] = None
+        words = sorted(self._mapping, key=len, reverse=True)
+        self._regex = re.compile("|".join(map(re.escape, words))) if words else None
+
+    def __bool__(self) -> bool:
+        return self._regex is not None
+
+    def apply(self, text: str, deleted: str = "") -> str:
+        """Return `text` with the rules applied; deleted words become `deleted`"""
+        if not self._regex or not text:
+            return text
+        mapping = self._mapping
+
+        def substitute(match):
+            new = mapping[match.group(0)]
+            return deleted if new is None else new
+
+        return self._regex.sub(substitute, text)
+
+
+def _apply_loop(text: str, delete_words, replacements: Dict[str, str]) -> str:
+    """The previous per-word implementation, kept for the benchmark below"""
+    for word in delete_words:
+        text = text.replace(word, "")
+    for word, new in replacements.items():
+        text = text.replace(word, new)
+    return text
+
+
+if __name__ == "__main__":
+    # python devgagan/core/text_rules.py
+    import random
+    import string
+    import timeit
+
+    random.seed(1)
+
+    def word():
+        return "".join(random.choices(string.ascii_lowercase, k=random.randint(4, 10)))
+
+    caption = " ".join(word() for _ in range(150))
+    for count in (10, 100, 500):
+        delete_words = [f"@{word()}" for _ in range(count // 2)]
+        replacements = {f"#{word()}": word() for _ in range(count - count // 2)}
+        text = caption + " " + " ".join(random.sample(delete_words, min(5, len(delete_words))))
+        rules = TextRules(delete_words, replacements)
+        assert rules.apply(text) == _apply_loop(text, delete_words, replacements)
+
+        runs = 2000
+        loop = timeit.timeit(lambda: _apply_loop(text, delete_words, replacements), number=runs)
+        compiled = timeit.timeit(lambda: rules.apply(text), number=runs)
+        build = timeit.timeit(lambda: TextRules(delete_words, replacements), number=20) / 20
+        print(f"{count:>4} rules: loop {loop / runs * 1e6:8.1f} us  compiled {compiled / runs * 1e6:8.1f} us  "
+              f"(x{loop / compiled:.1f})  build {build * 1e3:.2f} ms")
@@ -0,0 +1,165 @@
+# ---------------------------------------------------
+# File Name: thumbnails.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from typing import Dict, Optional
+from devgagan.core.probe import media_probe
+from config import THUMB_CACHE_DIR, THUMB_CACHE_MB, THUMB_WORKERS
+
+FFMPEG_TIMEOUT = 60
+_SAMPLE = 1024 * 1024
+
+
+def _content_key(path: str) -> str:
+    """Hash of the size and the first and last MiB; enough to tell files apart without reading them whole"""
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(_SAMPLE))
+        if size > 2 * _SAMPLE:
+            f.seek(-_SAMPLE, os.SEEK_END)
+            digest.update(f.read(_SAMPLE))
+    return digest.hexdigest()
+
+
+def _source_media(msg):
+    for attr in ("video", "document", "audio"):
+        media = getattr(msg, attr, None)
+        if media:
+            return media
+    return None
+
+
+class ThumbnailService:
+    """Video thumbnails, generated at most `workers` ffmpeg runs at a time and cached on disk.
+
+    Thumbnails are stored as `<key>.jpg` in `cache_dir`, where the key is the source's
+    `file_unique_id` or a hash of the file's content, so a file that is uploaded again reuses
+    its thumbnail. When the source message already has a Telegram thumbnail it is downloaded
+    instead of running ffmpeg. The least recently used files are removed once the directory
+    grows past `max_bytes`. Returned paths belong to the cache and must not be deleted.
+    """
+    def __init__(self, cache_dir: str = "thumbs", max_bytes: int = 200 * 1024 * 1024, workers: int = 2):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self._workers = asyncio.Semaphore(workers)
+        self._running: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.generated = 0
+        self.reused = 0
+
+    async def get(self, video: Optional[str] = None, duration: Optional[int] = None,
+                  client=None, msg=None) -> Optional[str]:
+        """Path of a thumbnail for `video` and/or the source `msg`, or None if neither yields one"""
+        media = _source_media(msg) if msg else None
+        try:
+            if media and getattr(media, "file_unique_id", None):
+                key = media.file_unique_id
+            elif video and os.path.exists(video):
+                key = await asyncio.to_thread(_content_key, video)
+            else:
+                return None
+        except OSError as e:
+            print(f"Thumbnail key error: {e}")
+            return None
+
+        path = os.path.join(self.cache_dir, f"{key}.jpg")
+        if os.path.exists(path):
+            self.hits += 1
+            os.utime(path)
+            return path
+
+        running = self._running.get(key)
+        if running is None:
+            running = self._running[key] = asyncio.ensure_future(self._create(path, video, duration, client, media))
+            running.add_done_callback(lambda _: self._running.pop(key, None))
+        return await asyncio.shield(running)
+
+    async def _create(self, path: str, video: Optional[str], duration: Optional[int], client, media) -> Optional[str]:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Written under a unique name and renamed, so concurrent uploads never see half a file
+        tmp = f"{path[:-4]}.{uuid.uuid4().hex}.tmp.jpg"
+        try:
+            if await self._from_source(tmp, client, media):
+                self.reused += 1
+            elif video and await self._from_video(tmp, video, duration):
+                self.generated += 1
+            else:
+                return None
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        await asyncio.to_thread(self._trim)
+        return path
+
+    async def _from_source(self, tmp: str, client, media) -> bool:
+        thumbs = getattr(media, "thumbs", None)
+        if not client or not thumbs:
+            return False
+        thumb = max(thumbs, key=lambda t: (t.width or 0) * (t.height or 0))
+        try:
+            return bool(await client.download_media(thumb.file_id, file_name=tmp))
+        except Exception as e:
+            print(f"Source thumbnail download failed: {e}")
+            return False
+
+    async def _from_video(self, tmp: str, video: str, duration: Optional[int]) -> bool:
+        if duration is None:
+            duration = (await media_probe.probe(video))['duration']
+        async with self._workers:
+            process = await asyncio.create_subprocess_exec(
+                "ffmpeg", "-loglevel", "error", "-ss", time.strftime('%H:%M:%S', time.gmtime(int(duration) / 2)),
+                "-i", video, "-frames:v", "1", "-vf", "scale=320:-2", tmp, "-y",
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            try:
+                await asyncio.wait_for(process.wait(), FFMPEG_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"ffmpeg timed out making a thumbnail for {video}")
+                process.kill()
+                await process.wait()
+                return False
+        return os.path.isfile(tmp) and os.path.getsize(tmp) > 0
+
+    def _trim(self):
+        """Drop the least recently used thumbnails until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp.jpg"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "generated": self.generated, "reused": self.reused}
+
+
+thumbnail_service = ThumbnailService(THUMB_CACHE_DIR, THUMB_CACHE_MB * 1024 * 1024, THUMB_WORKERS)
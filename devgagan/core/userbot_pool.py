@@ -0,0 +1,187 @@
+# ---------------------------------------------------
+# File Name: userbot_pool.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from pyrogram import Client
+from devgagan.core.ratelimit import install_pyrogram
+from config import API_ID, API_HASH, DOWNLOAD_CONNECTIONS, USERBOT_POOL_SIZE, USERBOT_IDLE_TIMEOUT, USERBOT_NEGATIVE_TTL, WORKER_MODE
+
+
+@dataclass
+class PooledClient:
+    client: Client
+    session_hash: str
+    refs: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    retired: bool = False
+
+
+class UserbotPool:
+    """Keeps started user clients alive between links instead of connecting per request.
+
+    Entries are evicted least-recently-used first when the pool is full, and by an idle
+    timeout; evicted clients are stopped. Clients in use (`refs > 0`) are never evicted,
+    so the cap may be exceeded briefly under load. A client replaced or discarded while in
+    use is retired instead: new callers get a fresh client and the old one is stopped once
+    its last user releases it. Sessions that failed to start are remembered for a while so
+    a dead session is not retried on every link.
+    """
+    def __init__(self, client_factory: Callable[[int, str], Client], max_clients: int = 50,
+                 idle_timeout: float = 900, negative_ttl: float = 300):
+        self.client_factory = client_factory
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.negative_ttl = negative_ttl
+        self._clients: "OrderedDict[int, PooledClient]" = OrderedDict()
+        self._invalid: Dict[int, Tuple[str, float]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self._retired: List[PooledClient] = []
+        self._stopping: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def _hash(session: str) -> str:
+        return hashlib.sha256(session.encode()).hexdigest()
+
+    async def acquire(self, user_id: int, session: str) -> Optional[Client]:
+        """Return a started client for this session, or None if the session is known to be dead"""
+        self._start_reaper()
+        session_hash = self._hash(session)
+        invalid = self._invalid.get(user_id)
+        if invalid and invalid[0] == session_hash and invalid[1] > time.monotonic():
+            return None
+
+        async with self._locks.setdefault(user_id, asyncio.Lock()):
+            entry = self._clients.get(user_id)
+            if entry and entry.session_hash != session_hash:
+                # User logged in again with another session
+                await self._evict(user_id)
+                entry = None
+
+            if not entry:
+                client = self.client_factory(user_id, session)
+                try:
+                    await client.start()
+                except Exception as e:
+                    print(f"Userbot start failed for {user_id}: {e}")
+                    self._invalid[user_id] = (session_hash, time.monotonic() + self.negative_ttl)
+                    return None
+                self._invalid.pop(user_id, None)
+                entry = self._clients[user_id] = PooledClient(client, session_hash)
+
+            entry.refs += 1
+            entry.last_used = time.monotonic()
+            self._clients.move_to_end(user_id)
+
+        await self._shrink()
+        return entry.client
+
+    def release(self, user_id: int, client: Client):
+        """Hand back a client from acquire(); a retired one is stopped by its last release"""
+        entry = self._clients.get(user_id)
+        if not entry or entry.client is not client:
+            # The user's entry was replaced meanwhile; the client is one of the retired ones
+            entry = next((old for old in self._retired if old.client is client), None)
+            if not entry:
+                return
+        entry.refs = max(0, entry.refs - 1)
+        entry.last_used = time.monotonic()
+        if entry.retired and not entry.refs:
+            self._retired.remove(entry)
+            task = asyncio.create_task(self._stop(user_id, entry))
+            self._stopping.add(task)
+            task.add_done_callback(self._stopping.discard)
+
+    async def discard(self, user_id: int):
+        """Forget a user's client, e.g. on logout; it is stopped as soon as nobody uses it"""
+        self._invalid.pop(user_id, None)
+        await self._evict(user_id)
+
+    def users(self) -> List[int]:
+        """Users with a live client here; worker mode prefers their jobs"""
+        return list(self._clients)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "live": len(self._clients),
+            "busy": sum(1 for entry in self._clients.values() if entry.refs),
+            "invalid": len(self._invalid),
+            "retired": len(self._retired)
+        }
+
+    async def _evict(self, user_id: int):
+        entry = self._clients.pop(user_id, None)
+        if not entry:
+            return
+        entry.retired = True
+        if entry.refs:
+            # Still downloading for someone; release() stops it when they are done
+            self._retired.append(entry)
+        else:
+            await self._stop(user_id, entry)
+
+    @staticmethod
+    async def _stop(user_id: int, entry: PooledClient):
+        try:
+            await entry.client.stop()
+        except Exception as e:
+            print(f"Userbot stop failed for {user_id}: {e}")
+
+    async def _shrink(self):
+        idle = [user_id for user_id, entry in self._clients.items() if not entry.refs]
+        while len(self._clients) > self.max_clients and idle:
+            await self._evict(idle.pop(0))
+
+    def _start_reaper(self):
+        if not self._reaper or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap())
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 60))
+            now = time.monotonic()
+            for user_id, entry in list(self._clients.items()):
+                if not entry.refs and now - entry.last_used > self.idle_timeout:
+                    await self._evict(user_id)
+            for user_id, (_, expires) in list(self._invalid.items()):
+                if expires <= now:
+                    del self._invalid[user_id]
+
+
+def _make_userbot(user_id: int, session: str) -> Client:
+    client = Client(
+        f"userbot_{user_id}",
+        api_id=API_ID,
+        api_hash=API_HASH,
+        device_model='iPhone 16 Pro',  # added gareebi text
+        session_string=session,
+        max_concurrent_transmissions=DOWNLOAD_CONNECTIONS,
+        # Workers only transfer files; updates are handled by the frontend
+        no_updates=WORKER_MODE == "worker"
+    )
+    # Buckets and flood windows are per account, so each user gets their own name
+    return install_pyrogram(client, f"user_{user_id}")
+
+
+userbot_pool = UserbotPool(
+    _make_userbot,
+    max_clients=USERBOT_POOL_SIZE,
+    idle_timeout=USERBOT_IDLE_TIMEOUT,
+    negative_ttl=USERBOT_NEGATIVE_TTL
+)
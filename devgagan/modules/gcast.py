@@ -13,7 +13,9 @@
 # ---------------------------------------------------
 
 import asyncio
+import traceback
 from pyrogram import filters
+from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid
 from config import OWNER_ID
 from devgagan import app
 from devgagan.core.mongo.users_db import get_users
@@ -26,8 +28,9 @@ async def send_msg(user_id, message):
         except Exception:
             await x.pin(both_sides=True)
     except FloodWait as e:
-        await asyncio.sleep(e.x)
-        return send_msg(user_id, message)
+        # Only waits longer than FLOOD_MAX_WAIT get here; the client queues shorter ones itself
+        await asyncio.sleep(e.value)
+        return await send_msg(user_id, message)
     except InputUserDeactivated:
         return 400, f"{user_id} : deactivated\n"
     except UserIsBlocked:
@@ -36,6 +39,7 @@ async def send_msg(user_id, message):
         return 400, f"{user_id} : user id invalid\n"
     except Exception:
         return 500, f"{user_id} : {traceback.format_exc()}\n"
+    return 200, None
 
 
 @app.on_message(filters.command("gcast") & filters.user(OWNER_ID))
@@ -49,12 +53,10 @@ async def broadcast(_, message):
     failed_users = 0
     
     for user in all_users:
-        try:
-            await send_msg(user, message.reply_to_message)
+        status, _ = await send_msg(user, message.reply_to_message)
+        if status == 200:
             done_users += 1
-            await asyncio.sleep(0.1)
-        except Exception:
-            pass
+        else:
             failed_users += 1
     if failed_users == 0:
         await exmsg.edit_text(
@@ -75,16 +77,17 @@ async def announced(_, message):
       to_send=message.reply_to_message.id
     if not message.reply_to_message:
       return await message.reply_text("Reply To Some Post To Broadcast")
+    exmsg = await message.reply_text("sᴛᴀʀᴛᴇᴅ ʙʀᴏᴀᴅᴄᴀsᴛɪɴɢ!")
     users = await get_users() or []
-    print(users)
-    failed_user = 0
+    done_users = 0
+    failed_users = 0
   
     for user in users:
       try:
         await _.forward_messages(chat_id=int(user), from_chat_id=message.chat.id, message_ids=to_send)
-        await asyncio.sleep(1)
+        done_users += 1
       except Exception as e:
-        failed_user += 1
+        failed_users += 1
           
     if failed_users == 0:
         await exmsg.edit_text(
@@ -20,6 +20,7 @@ import asyncio
 import string
 from devgagan.core.mongo import db
 from devgagan.core.func import subscribe, chk_user
+from devgagan.core.userbot_pool import userbot_pool
 from config import API_ID as api_id, API_HASH as api_hash
 from pyrogram.errors import (
     ApiIdInvalid,
@@ -57,6 +58,7 @@ async def delete_session_files(user_id):
 @app.on_message(filters.command("logout"))
 async def clear_db(client, message):
     user_id = message.chat.id
+    await userbot_pool.discard(user_id)
     files_deleted = await delete_session_files(user_id)
     try:
         await db.remove_session(user_id)
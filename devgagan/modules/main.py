@@ -17,12 +17,14 @@ import time
 import random
 import string
 import asyncio
-from pyrogram import filters, Client
+from pyrogram import filters
 from devgagan import app, userrbot
-from config import API_ID, API_HASH, FREEMIUM_LIMIT, PREMIUM_LIMIT, OWNER_ID, DEFAULT_SESSION
-from devgagan.core.get_func import get_msg
+from config import FREEMIUM_LIMIT, PREMIUM_LIMIT, OWNER_ID, DEFAULT_SESSION, FREE_BATCH_CONCURRENCY, PREMIUM_BATCH_CONCURRENCY, BATCH_ITEM_DELAY, WORKER_ID, WORKER_MODE, WORKER_MAX_JOBS, JOB_LEASE_SECONDS, JOB_POLL_INTERVAL
+from devgagan.core.get_func import get_msg, load_profile
+from devgagan.core.batch import BatchExecutor, FloodPacer, ItemCancelled
+from devgagan.core.userbot_pool import userbot_pool
 from devgagan.core.func import *
-from devgagan.core.mongo import db
+from devgagan.core.mongo import db, jobs_db
 from pyrogram.errors import FloodWait
 from datetime import datetime, timedelta
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
@@ -34,17 +36,18 @@ async def generate_random_name(length=8):
 
 
 users_loop = {}
+job_tasks = {}  # user_id -> task running that user's stored job in this process
 interval_set = {}
 batch_mode = {}
+BATCH_KEYBOARD = InlineKeyboardMarkup([[InlineKeyboardButton("Join Channel", url="https://t.me/team_spy_pro")]])
 
-async def process_and_upload_link(userbot, user_id, msg_id, link, retry_count, message):
+async def process_and_upload_link(userbot, user_id, msg_id, link, retry_count, message, turn=None, profile=None):
     try:
-        await get_msg(userbot, user_id, msg_id, link, retry_count, message)
+        await get_msg(userbot, user_id, msg_id, link, retry_count, message, turn, profile)
         try:
             await app.delete_messages(user_id, msg_id)
         except Exception:
             pass
-        await asyncio.sleep(15)
     finally:
         pass
 
@@ -83,28 +86,37 @@ async def single_link(_, message):
     if await subscribe(_, message) == 1 or user_id in batch_mode:
         return
 
-    # Check if user is already in a loop
-    if users_loop.get(user_id, False):
+    # Check if user is already in a loop (jobs queued for workers count too)
+    if users_loop.get(user_id, False) or (WORKER_MODE == "frontend" and await jobs_db.has_active_job(user_id)):
         await message.reply(
             "You already have an ongoing process. Please wait for it to finish or cancel it with /cancel."
         )
         return
 
     # Check freemium limits
-    if await chk_user(message, user_id) == 1 and FREEMIUM_LIMIT == 0 and user_id not in OWNER_ID and not await is_user_verified(user_id):
+    freecheck = await chk_user(message, user_id)
+    if freecheck == 1 and FREEMIUM_LIMIT == 0 and user_id not in OWNER_ID and not await is_user_verified(user_id):
         await message.reply("Freemium service is currently not available. Upgrade to premium for access.")
         return
 
     # Check cooldown
-    can_proceed, response_message = await check_interval(user_id, await chk_user(message, user_id))
+    can_proceed, response_message = await check_interval(user_id, freecheck)
     if not can_proceed:
         await message.reply(response_message)
         return
 
+    link = message.text if "tg://openmessage" in message.text else get_link(message.text)
+
+    # Frontend mode hands downloads to the workers; joining invite links stays here
+    if WORKER_MODE == "frontend" and link and 't.me/+' not in link:
+        await jobs_db.create_job(user_id, [link], freecheck, None, kind="single")
+        await set_interval(user_id, interval_minutes=45)
+        await message.reply("⏳ Queued, your file will be processed shortly.")
+        return
+
     # Add user to the loop
     users_loop[user_id] = True
 
-    link = message.text if "tg://openmessage" in message.text else get_link(message.text)
     msg = await message.reply("Processing...")
     userbot = await initialize_userbot(user_id)
     try:
@@ -115,11 +127,12 @@ async def single_link(_, message):
             await process_special_links(userbot, user_id, msg, link)
             
     except FloodWait as fw:
-        await msg.edit_text(f'Try again after {fw.x} seconds due to floodwait from Telegram.')
+        await msg.edit_text(f'Try again after {fw.value} seconds due to floodwait from Telegram.')
     except Exception as e:
         await msg.edit_text(f"Link: `{link}`\n\n**Error:** {str(e)}")
     finally:
         users_loop[user_id] = False
+        release_userbot(user_id, userbot)
         try:
             await msg.delete()
         except Exception:
@@ -129,20 +142,11 @@ async def single_link(_, message):
 async def initialize_userbot(user_id): # this ensure the single startup .. even if logged in or not
     data = await db.get_data(user_id)
     if data and data.get("session"):
-        try:
-            device = 'iPhone 16 Pro' # added gareebi text
-            userbot = Client(
-                "userbot",
-                api_id=API_ID,
-                api_hash=API_HASH,
-                device_model=device,
-                session_string=data.get("session")
-            )
-            await userbot.start()
-            return userbot
-        except Exception:
+        # Started clients are pooled per user; release_userbot() hands them back
+        userbot = await userbot_pool.acquire(user_id, data.get("session"))
+        if userbot is None:
             await app.send_message(user_id, "Login Expired re do login")
-            return None
+        return userbot
     else:
         if DEFAULT_SESSION:
             return userrbot
@@ -150,6 +154,11 @@ async def initialize_userbot(user_id): # this ensure the single startup .. even
             return None
 
 
+def release_userbot(user_id, userbot):
+    if userbot is not None and userbot is not userrbot:
+        userbot_pool.release(user_id, userbot)
+
+
 async def is_normal_tg_link(link: str) -> bool:
     """Check if the link is a standard Telegram link."""
     special_identifiers = ['t.me/+', 't.me/c/', 't.me/b/', 'tg://openmessage']
@@ -176,8 +185,8 @@ async def batch_link(_, message):
     if join == 1:
         return
     user_id = message.chat.id
-    # Check if a batch process is already running
-    if users_loop.get(user_id, False):
+    # Check if a batch process is already running, here or as a stored job
+    if users_loop.get(user_id, False) or await jobs_db.has_active_job(user_id):
         await app.send_message(
             message.chat.id,
             "You already have a batch process running. Please wait for it to complete."
@@ -227,77 +236,261 @@ async def batch_link(_, message):
         await message.reply(response_message)
         return
         
-    join_button = InlineKeyboardButton("Join Channel", url="https://t.me/team_spy_pro")
-    keyboard = InlineKeyboardMarkup([[join_button]])
+    base_link = '/'.join(start_id.split('/')[:-1])
+    links = [get_link(f"{base_link}/{i}") for i in range(cs, cs + cl)]
+    # Normal t.me links work without login, private (t.me/b/, t.me/c/) ones need the userbot
+    if not any(x in links[0] for x in ['t.me/b/', 't.me/c/', 'tg://openmessage']):
+        links = [link for link in links if 't.me/' in link]
+    else:
+        links = [link for link in links if any(x in link for x in ['t.me/b/', 't.me/c/'])]
+
     pin_msg = await app.send_message(
         user_id,
         f"Batch process started ⚡\nProcessing: 0/{cl}\n\n**Powered by Team SPY**",
-        reply_markup=keyboard
+        reply_markup=BATCH_KEYBOARD
     )
     await pin_msg.pin(both_sides=True)
 
+    # The job is stored before it starts, so a restart resumes it instead of losing it
+    job_id = await jobs_db.create_job(user_id, links, freecheck, pin_msg.id)
+    if WORKER_MODE == "frontend":
+        # A worker process picks it up
+        await set_interval(user_id, interval_minutes=300)
+        return
+    job = await jobs_db.claim_job(job_id, WORKER_ID, JOB_LEASE_SECONDS)
+    if job:
+        await run_batch_job(job)
+
+
+async def run_batch_job(job):
+    """Run a claimed batch job from its checkpoint, renewing the lease while it runs"""
+    job_id, user_id, links = job["_id"], job["user_id"], job["links"]
+    cl = len(links)
+    items = job.get("items", {})
+    # Items interrupted while delivering may have been sent already, so they are not sent twice
+    unconfirmed = sorted(int(seq) for seq, item_status in items.items() if item_status == "delivering")
+    finished = {int(seq) for seq in items} | set(range(job["next_seq"]))
+    checkpoint = job["next_seq"]
+    completed = sum(1 for status in items.values() if status == "done")
+    # Completed items are skipped; the rest are renumbered so delivery order is kept
+    pending = [(seq, link) for seq, link in enumerate(links) if seq not in finished]
+    single = job.get("kind") == "single"
+
+    # A user's jobs run in one process at a time, like users_loop does within a process
+    if not await jobs_db.acquire_user_lease(user_id, WORKER_ID, JOB_LEASE_SECONDS):
+        await jobs_db.release_job(job_id, WORKER_ID)
+        return
+
     users_loop[user_id] = True
+    lease_lost = False
+    status = None
+    userbot = None
+
+    async def keep_lease():
+        nonlocal lease_lost
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                if not (await jobs_db.renew_lease(job_id, WORKER_ID, JOB_LEASE_SECONDS)
+                        and await jobs_db.acquire_user_lease(user_id, WORKER_ID, JOB_LEASE_SECONDS)):
+                    # Cancelled, or taken over by another worker after our lease ran out
+                    lease_lost = True
+                    return
+            except Exception as e:
+                print(f"Lease renewal failed for job {job_id}: {e}")
+
+    heartbeat = asyncio.create_task(keep_lease())
     try:
-        normal_links_handled = False
         userbot = await initialize_userbot(user_id)
-        # Handle normal links first
-        for i in range(cs, cs + cl):
-            if user_id in users_loop and users_loop[user_id]:
-                url = f"{'/'.join(start_id.split('/')[:-1])}/{i}"
-                link = get_link(url)
-                # Process t.me links (normal) without userbot
-                if 't.me/' in link and not any(x in link for x in ['t.me/b/', 't.me/c/', 'tg://openmessage']):
-                    msg = await app.send_message(message.chat.id, f"Processing...")
-                    await process_and_upload_link(userbot, user_id, msg.id, link, 0, message)
-                    await pin_msg.edit_text(
-                        f"Batch process started ⚡\nProcessing: {i - cs + 1}/{cl}\n\n**__Powered by Team SPY__**",
-                        reply_markup=keyboard
-                    )
-                    normal_links_handled = True
-        if normal_links_handled:
-            await set_interval(user_id, interval_minutes=300)
-            await pin_msg.edit_text(
-                f"Batch completed successfully for {cl} messages 🎉\n\n**__Powered by Team SPY__**",
-                reply_markup=keyboard
-            )
-            await app.send_message(message.chat.id, "Batch completed successfully! 🎉")
+        # Same login requirements as batch_link and process_special_links
+        private = ['t.me/b/', 't.me/c/', '/s/', 'tg://openmessage'] if single else ['t.me/b/', 't.me/c/']
+        if links and not userbot and any(x in links[0] for x in private):
+            await app.send_message(user_id, "Try logging in to the bot and try again." if single else "Login in bot first ...")
+            status = "failed"
             return
-            
-        # Handle special links with userbot
-        for i in range(cs, cs + cl):
-            if not userbot:
-                await app.send_message(message.chat.id, "Login in bot first ...")
-                users_loop[user_id] = False
+
+        profile = await load_profile(user_id)
+
+        async def record(seq, item_status):
+            nonlocal checkpoint
+            finished.add(seq)
+            while checkpoint in finished:
+                checkpoint += 1
+            await jobs_db.mark_item(job_id, seq, item_status, checkpoint)
+
+        for seq in unconfirmed:
+            await record(seq, "skipped")
+        if unconfirmed:
+            await app.send_message(
+                user_id,
+                "⚠️ These links were being sent when the bot restarted and were not sent again. "
+                "Send them once more if they are missing:\n" + "\n".join(links[seq] for seq in unconfirmed)
+            )
+
+        flood_waits = {}
+
+        async def process(index, item, turn):
+            seq, link = item
+            msg = await app.send_message(user_id, "Processing...")
+            try:
+                await process_and_upload_link(userbot, user_id, msg.id, link, 0, None, turn, profile)
+            except ItemCancelled:
+                try:
+                    await msg.delete()
+                except Exception:
+                    pass
+                raise
+            except FloodWait as fw:
+                # The executor retries; a message is only left if the last attempt fails too
+                flood_waits[index] = fw.value
+                try:
+                    await msg.delete()
+                except Exception:
+                    pass
+                raise
+            except Exception as e:
+                # Same report as single_link gives when it runs the link itself
+                flood_waits.pop(index, None)
+                try:
+                    await msg.edit_text(f"Link: `{link}`\n\n**Error:** {str(e)}")
+                except Exception:
+                    pass
+                raise
+
+        async def item_done(index):
+            nonlocal completed
+            await record(pending[index][0], "done")
+            completed += 1
+            if single:
                 return
-            if user_id in users_loop and users_loop[user_id]:
-                url = f"{'/'.join(start_id.split('/')[:-1])}/{i}"
-                link = get_link(url)
-                if any(x in link for x in ['t.me/b/', 't.me/c/']):
-                    msg = await app.send_message(message.chat.id, f"Processing...")
-                    await process_and_upload_link(userbot, user_id, msg.id, link, 0, message)
-                    await pin_msg.edit_text(
-                        f"Batch process started ⚡\nProcessing: {i - cs + 1}/{cl}\n\n**__Powered by Team SPY__**",
-                        reply_markup=keyboard
-                    )
+            await app.edit_message_text(
+                user_id, job["pin_msg_id"],
+                f"Batch process started ⚡\nProcessing: {completed}/{cl}\n\n**__Powered by Team SPY__**",
+                reply_markup=BATCH_KEYBOARD
+            )
+
+        async def item_failed(index):
+            await record(pending[index][0], "failed")
+            if single and index in flood_waits:
+                await app.send_message(user_id, f'Try again after {flood_waits[index]} seconds due to floodwait from Telegram.')
+
+        async def item_delivering(index):
+            nonlocal lease_lost
+            seq = pending[index][0]
+            # /cancel from another process is otherwise only seen at the next lease renewal
+            if not users_loop.get(user_id, False) or lease_lost:
+                raise ItemCancelled()
+            if not await jobs_db.mark_delivering(job_id, WORKER_ID, seq, checkpoint):
+                lease_lost = True
+                raise ItemCancelled()
+
+        executor = BatchExecutor(
+            process,
+            concurrency=FREE_BATCH_CONCURRENCY if job["freecheck"] == 1 else PREMIUM_BATCH_CONCURRENCY,
+            is_active=lambda: users_loop.get(user_id, False) and not lease_lost,
+            on_item_done=item_done,
+            on_item_failed=item_failed,
+            on_item_delivering=item_delivering,
+            pacer=FloodPacer(base_delay=BATCH_ITEM_DELAY)
+        )
+        await executor.run(enumerate(pending))
 
+        if lease_lost:
+            return
+        if not users_loop.get(user_id, False):
+            status = "cancelled"
+            return
+        status = "done"
+        if single:
+            return
         await set_interval(user_id, interval_minutes=300)
-        await pin_msg.edit_text(
+        await app.edit_message_text(
+            user_id, job["pin_msg_id"],
             f"Batch completed successfully for {cl} messages 🎉\n\n**__Powered by Team SPY__**",
-            reply_markup=keyboard
+            reply_markup=BATCH_KEYBOARD
         )
-        await app.send_message(message.chat.id, "Batch completed successfully! 🎉")
+        await app.send_message(user_id, "Batch completed successfully! 🎉")
 
     except Exception as e:
-        await app.send_message(message.chat.id, f"Error: {e}")
+        status = "failed"
+        await app.send_message(user_id, f"Error: {e}")
     finally:
+        heartbeat.cancel()
+        # Without a status (shutdown, lost lease) the job stays open and is resumed later
+        if status:
+            await jobs_db.finish_job(job_id, WORKER_ID, status)
+        await jobs_db.release_user_lease(user_id, WORKER_ID)
         users_loop.pop(user_id, None)
+        release_userbot(user_id, userbot)
+
+
+def start_job(job):
+    """Run a claimed job in the background, keeping a reference to it until it finishes"""
+    user_id = job["user_id"]
+    task = asyncio.create_task(run_batch_job(job))
+    job_tasks[user_id] = task
+
+    def forget(task):
+        if job_tasks.get(user_id) is task:
+            del job_tasks[user_id]
+        if not task.cancelled() and task.exception():
+            print(f"Job {job['_id']} failed on worker {WORKER_ID}: {task.exception()}")
+
+    task.add_done_callback(forget)
+    return task
+
+
+async def resume_batch_jobs():
+    """Pick up batch jobs interrupted by a restart, continuing from their checkpoints"""
+    claimed = set()
+    while True:
+        # The user lease in run_batch_job guards against running a user twice; leases still held
+        # under our own id are left over from before the restart
+        busy = set(await jobs_db.leased_users(exclude_owner=WORKER_ID)) | claimed
+        job = await jobs_db.claim_next_job(WORKER_ID, JOB_LEASE_SECONDS, exclude_users=busy)
+        if not job:
+            return
+        claimed.add(job["user_id"])
+        done = sum(1 for status in job.get("items", {}).values() if status == "done")
+        try:
+            await app.send_message(job["user_id"], f"♻️ Resuming your batch after a restart: {done}/{len(job['links'])} done.")
+        except Exception:
+            pass
+        start_job(job)
+
+
+async def run_job_worker():
+    """Worker mode: run queued jobs from MongoDB, up to WORKER_MAX_JOBS at once.
+
+    Users whose userbot is already connected here are served first, and users leased by
+    another worker are skipped, so each user's jobs stay on one process.
+    """
+    slots = asyncio.Semaphore(WORKER_MAX_JOBS)
+
+    while True:
+        await slots.acquire()
+        try:
+            busy = set(await jobs_db.leased_users(exclude_owner=WORKER_ID)) | set(job_tasks)
+            job = await jobs_db.claim_next_job(WORKER_ID, JOB_LEASE_SECONDS, exclude_users=busy, prefer_users=userbot_pool.users())
+        except Exception as e:
+            print(f"Job queue poll failed: {e}")
+            job = None
+        if not job:
+            slots.release()
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            continue
+        start_job(job).add_done_callback(lambda _: slots.release())
+
 
 @app.on_message(filters.command("cancel"))
 async def stop_batch(_, message):
     user_id = message.chat.id
 
+    # Stored jobs are cancelled too, so they are not resumed after a restart
+    stored = await jobs_db.cancel_user_jobs(user_id)
+
     # Check if there is an active batch process for the user
-    if user_id in users_loop and users_loop[user_id]:
+    if (user_id in users_loop and users_loop[user_id]) or stored:
         users_loop[user_id] = False  # Set the loop status to False
         await app.send_message(
             message.chat.id, 
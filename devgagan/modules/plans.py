@@ -21,6 +21,11 @@ from config import OWNER_ID
 from devgagan.core.func import get_seconds
 from devgagan.core.mongo import plans_db  
 from pyrogram import filters 
+from pyrogram.errors import FloodWait
+
+NOTIFY_CONCURRENCY = 5  # expiry messages sent at once
+_notify_tasks = set()  # running notifications, kept referenced until they finish
+FLOOD_RETRIES = 5  # FloodWaits waited out per user lookup before giving up on it
 
 
 
@@ -180,49 +185,111 @@ async def transfer_premium(client, message):
         await message.reply_text("⚠️ **Usage:** /transfer user_id\n\nReplace `user_id` with the new user's ID.")
 
 
-async def premium_remover():
-    all_users = await plans_db.premium_users()
-    removed_users = []
-    not_removed_users = []
+async def get_users(user_ids):
+    """app.get_users, waiting out up to FLOOD_RETRIES FloodWaits"""
+    for attempt in range(FLOOD_RETRIES + 1):
+        try:
+            return await app.get_users(user_ids)
+        except FloodWait as fw:
+            if attempt == FLOOD_RETRIES:
+                raise
+            await asyncio.sleep(fw.value)
+
 
-    for user_id in all_users:
+async def fetch_users(user_ids):
+    """Resolve users 200 per request; ids that cannot be resolved are left out"""
+    users = {}
+    for i in range(0, len(user_ids), 200):
+        chunk = user_ids[i:i + 200]
         try:
-            user = await app.get_users(user_id)
-            chk_time = await plans_db.check_premium(user_id)
+            found = await get_users(chunk)
+        except FloodWait:
+            # Still flooded after the retries; later chunks would hit the same wall
+            print(f"Skipping {len(user_ids) - i} user lookups after repeated FloodWaits")
+            break
+        except Exception:
+            # One bad id fails the whole request, so fall back to single lookups for this chunk
+            found = []
+            for user_id in chunk:
+                try:
+                    found.append(await get_users(user_id))
+                except Exception:
+                    pass
+        for user in (found if isinstance(found, list) else [found]):
+            users[user.id] = user
+    return users
+
 
-            if chk_time and chk_time.get("expire_date"):
-                expiry_date = chk_time["expire_date"]
+async def notify_expired_users(user_ids):
+    """Tell users their plan ended, a few at a time and backing off on FloodWait"""
+    users = await fetch_users(list(user_ids))
+    slots = asyncio.Semaphore(NOTIFY_CONCURRENCY)
 
-                if expiry_date <= datetime.datetime.now():
-                    name = user.first_name
-                    await plans_db.remove_premium(user_id)
+    async def notify(user_id):
+        name = users[user_id].first_name if user_id in users else "there"
+        async with slots:
+            for _ in range(2):
+                try:
                     await app.send_message(user_id, text=f"Hello {name}, your premium subscription has expired.")
-                    print(f"{name}, your premium subscription has expired.")
-                    removed_users.append(f"{name} ({user_id})")
-                else:
-                    name = user.first_name
-                    current_time = datetime.datetime.now()
-                    time_left = expiry_date - current_time
-
-                    days = time_left.days
-                    hours, remainder = divmod(time_left.seconds, 3600)
-                    minutes, seconds = divmod(remainder, 60)
-
-                    if days > 0:
-                        remaining_time = f"{days} days, {hours} hours, {minutes} minutes, {seconds} seconds"
-                    elif hours > 0:
-                        remaining_time = f"{hours} hours, {minutes} minutes, {seconds} seconds"
-                    elif minutes > 0:
-                        remaining_time = f"{minutes} minutes, {seconds} seconds"
-                    else:
-                        remaining_time = f"{seconds} seconds"
-
-                    print(f"{name} : Remaining Time : {remaining_time}")
-                    not_removed_users.append(f"{name} ({user_id})")
-        except:
+                    return
+                except FloodWait as fw:
+                    await asyncio.sleep(fw.value)
+                except Exception:
+                    return
+
+    await asyncio.gather(*(notify(user_id) for user_id in user_ids))
+
+
+def _notify_done(task):
+    _notify_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        print(f"Expiry notification failed: {task.exception()}")
+
+
+async def premium_remover():
+    expired = await plans_db.remove_expired_users()
+    removed_users = []
+    not_removed_users = []
+
+    remaining = list(plans_db.premium_index)
+    users = await fetch_users(expired + remaining)
+    for user_id in expired:
+        name = users[user_id].first_name if user_id in users else "Unknown"
+        print(f"{name}, your premium subscription has expired.")
+        removed_users.append(f"{name} ({user_id})")
+    task = asyncio.create_task(notify_expired_users([user_id for user_id in expired if user_id in users]))
+    _notify_tasks.add(task)
+    task.add_done_callback(_notify_done)
+
+    current_time = datetime.datetime.now()
+    for user_id in remaining:
+        if user_id not in users:
             await plans_db.remove_premium(user_id)
             print(f"Unknown users captured : {user_id} removed")
             removed_users.append(f"Unknown ({user_id})")
+            continue
+
+        name = users[user_id].first_name
+        expiry_date = plans_db.premium_index.get(user_id)
+        if not isinstance(expiry_date, datetime.datetime):
+            continue
+        time_left = expiry_date - current_time
+
+        days = time_left.days
+        hours, remainder = divmod(time_left.seconds, 3600)
+        minutes, seconds = divmod(remainder, 60)
+
+        if days > 0:
+            remaining_time = f"{days} days, {hours} hours, {minutes} minutes, {seconds} seconds"
+        elif hours > 0:
+            remaining_time = f"{hours} hours, {minutes} minutes, {seconds} seconds"
+        elif minutes > 0:
+            remaining_time = f"{minutes} minutes, {seconds} seconds"
+        else:
+            remaining_time = f"{seconds} seconds"
+
+        print(f"{name} : Remaining Time : {remaining_time}")
+        not_removed_users.append(f"{name} ({user_id})")
 
     return removed_users, not_removed_users
 
@@ -14,8 +14,8 @@
 
 from pyrogram import filters
 from devgagan import app
-from config import OWNER_ID
-from devgagan.core.func import subscribe
+from config import OWNER_ID, CHANNEL_ID
+from devgagan.core.func import subscribe, invalidate_membership
 import asyncio
 from devgagan.core.func import *
 from pyrogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
@@ -23,6 +23,14 @@ from pyrogram.raw.functions.bots import SetBotInfo
 from pyrogram.raw.types import InputUserSelf
 
 from pyrogram.types import BotCommand, InlineKeyboardButton, InlineKeyboardMarkup
+
+
+@app.on_chat_member_updated(filters.chat(CHANNEL_ID))
+async def channel_member_updated(_, update):
+    # Joins, leaves and bans in the force-subscribe channel take effect immediately
+    member = update.new_chat_member or update.old_chat_member
+    if member and member.user:
+        invalidate_membership(member.user.id)
  
 @app.on_message(filters.command("set"))
 async def set(_, message):
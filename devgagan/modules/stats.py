@@ -20,8 +20,15 @@ import motor
 from devgagan import app
 from pyrogram import filters
 from config import OWNER_ID
-from devgagan.core.mongo.users_db import get_users, add_user, get_user
-from devgagan.core.mongo.plans_db import premium_users
+from devgagan.core.mongo.users_db import add_user, count_users
+from devgagan.core.mongo.plans_db import count_premium
+from devgagan.core.mongo.cache_db import cache_stats
+from devgagan.core.get_func import telegram_bot
+from devgagan.core.progress import progress_hub
+from devgagan.core.ratelimit import rate_limiter
+from devgagan.core.thumbnails import thumbnail_service
+from devgagan.core.admission import disk_admission
+from devgagan.core.mongo.jobs_db import job_counts
 
 
 
@@ -31,9 +38,7 @@ start_time = time.time()
 async def chat_watcher_func(_, message):
     try:
         if message.from_user:
-            us_in_db = await get_user(message.from_user.id)
-            if not us_in_db:
-                await add_user(message.from_user.id)
+            await add_user(message.from_user.id)
     except:
         pass
 
@@ -63,17 +68,30 @@ def time_formatter():
 @app.on_message(filters.command("stats") & filters.user(OWNER_ID))
 async def stats(client, message):
     start = time.time()
-    users = len(await get_users())
-    premium = await premium_users()
+    users = await count_users()
     ping = round((time.time() - start) * 1000)
+    premium = await count_premium()
+    settings_cache = telegram_bot.db.cache_stats()
+    progress = progress_hub.stats()
+    limiter = rate_limiter.stats()
+    thumbs = thumbnail_service.stats()
+    disk = disk_admission.stats()
+    jobs = await job_counts()
     await message.reply_text(f"""
 **Stats of** {(await client.get_me()).mention} :
 
 🏓 **Ping Pong**: {ping}ms
 
 📊 **Total Users** : `{users}`
-📈 **Premium Users** : `{len(premium)}`
+📈 **Premium Users** : `{premium}`
 ⚙️ **Bot Uptime** : `{time_formatter()}`
+🗂 **File Cache** : `{cache_stats['hits']}` hits / `{cache_stats['misses']}` misses / `{cache_stats['invalidations']}` invalidated
+⚡ **Settings Cache** : `{settings_cache['size']}` users / `{settings_cache['hits']}` hits / `{settings_cache['misses']}` misses / `{settings_cache['evictions']}` evicted
+📝 **Progress Edits** : `{progress['edits']}` sent / `{progress['coalesced']}` coalesced / `{progress['flood_waits']}` flood waits
+🚦 **Rate Limiter** : `{limiter['queued']}` queued / `{limiter['flood_waits']}` flood waits / `{limiter['windows']}` active windows
+🖼 **Thumbnails** : `{thumbs['hits']}` cached / `{thumbs['reused']}` from source / `{thumbs['generated']}` generated
+💾 **Scratch Disk** : `{disk['free'] / 1024**3:.2f} GB` free / `{disk['reserved'] / 1024**3:.2f} GB` reserved by `{disk['active']}` downloads / `{disk['queued']}` queued
+🧵 **Jobs** : `{jobs['queued']}` queued / `{jobs['running']}` running
     
 🎨 **Python Version**: `{sys.version.split()[0]}`
 📑 **Mongo Version**: `{motor.version}`
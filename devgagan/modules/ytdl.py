@@ -22,13 +22,17 @@ import random
 import string
 import requests
 import logging
-import cv2
 from devgagan import sex as client
 from pyrogram import Client,filters
 from telethon import events
 from telethon.sync import TelegramClient
 from telethon.tl.types import DocumentAttributeVideo
-from devgagan.core.func import screenshot, video_metadata, progress_bar
+from devgagan.core.func import video_metadata, progress_bar
+from devgagan.core.get_func import telegram_bot
+from devgagan.core.progress import progress_hub
+from devgagan.core.splitter import upload_split_parts
+from devgagan.core.admission import disk_admission
+from config import LOG_GROUP, SPLIT_UPLOAD_WORKERS
 from telethon.tl.functions.messages import EditMessageRequest
 from devgagantools import fast_upload
 from concurrent.futures import ThreadPoolExecutor
@@ -66,10 +70,10 @@ async def download_thumbnail_async(url, path):
                     f.write(await response.read())
  
  
-async def extract_audio_async(ydl_opts, url):
+async def extract_audio_async(ydl_opts, url, download=True):
     def sync_extract():
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            return ydl.extract_info(url, download=True)
+            return ydl.extract_info(url, download=download)
     return await asyncio.get_event_loop().run_in_executor(thread_pool, sync_extract)
  
  
@@ -102,11 +106,18 @@ async def process_audio(client, event, url, cookies_env_var=None):
         'noplaylist': True,
     }
     prog = None
+    reservation = None
  
     progress_message = await event.reply("**__Starting audio extraction...__**")
  
     try:
-         
+        info_dict = await extract_audio_async(ydl_opts, url, download=False)
+        # The downloaded stream and the converted mp3 sit on disk together
+        reservation = await disk_admission.acquire(
+            2 * (info_dict.get('filesize') or info_dict.get('filesize_approx') or 0),
+            on_wait=lambda: progress_message.edit("**__Waiting for free disk space...__**")
+        )
+        reservation.track(download_path)
         info_dict = await extract_audio_async(ydl_opts, url)
         title = info_dict.get('title', 'Extracted Audio')
  
@@ -146,7 +157,7 @@ async def process_audio(client, event, url, cookies_env_var=None):
             prog = await client.send_message(chat_id, "**__Starting Upload...__**")
             uploaded = await fast_upload(
                 client, download_path, 
-                reply=prog, 
+                reply=progress_hub.reply_proxy(prog), 
                 name=None,
                 progress_bar_function=lambda done, total: progress_callback(done, total, chat_id)
             )
@@ -164,6 +175,8 @@ async def process_audio(client, event, url, cookies_env_var=None):
             os.remove(download_path)
         if temp_cookie_path and os.path.exists(temp_cookie_path):
             os.remove(temp_cookie_path)
+        if reservation:
+            reservation.release()
  
 @client.on(events.NewMessage(pattern="/adl"))
 async def handler(event):
@@ -347,6 +360,7 @@ async def process_video(client, event, url, cookies_env_var, check_duration_and_
         'verbose': True,
     }
     prog = None
+    reservation = None
     progress_message = await event.reply("**__Starting download...__**")
     logger.info("Starting the download process...")
     try:
@@ -354,9 +368,16 @@ async def process_video(client, event, url, cookies_env_var, check_duration_and_
         if not info_dict:
             return
          
+        reservation = await disk_admission.acquire(
+            info_dict.get('filesize') or info_dict.get('filesize_approx') or 0,
+            on_wait=lambda: progress_message.edit("**__Waiting for free disk space...__**")
+        )
+        # yt-dlp writes to a .part file and renames it when done
+        reservation.track(download_path + ".part")
+        reservation.track(download_path)
         await asyncio.to_thread(download_video, url, ydl_opts)
         title = info_dict.get('title', 'Powered by Team SPY')
-        k = video_metadata(download_path)      
+        k = await video_metadata(download_path)      
         W = k['width']
         H = k['height']
         D = k['duration']
@@ -376,7 +397,7 @@ async def process_video(client, event, url, cookies_env_var, check_duration_and_
         if thumbnail_file:
             THUMB = thumbnail_file
         else:
-            THUMB = await screenshot(download_path, metadata['duration'], event.sender_id)
+            THUMB = await telegram_bot.resolve_thumbnail(event.sender_id, download_path, metadata['duration'])
  
          
  
@@ -395,7 +416,7 @@ async def process_video(client, event, url, cookies_env_var, check_duration_and_
             prog = await client.send_message(chat_id, "**__Starting Upload...__**")
             uploaded = await fast_upload(
                 client, download_path,
-                reply=prog,
+                reply=progress_hub.reply_proxy(prog),
                 progress_bar_function=lambda done, total: progress_callback(done, total, chat_id)
             )
             await client.send_file(
@@ -427,6 +448,8 @@ async def process_video(client, event, url, cookies_env_var, check_duration_and_
             os.remove(temp_cookie_path)
         if thumbnail_file and os.path.exists(thumbnail_file):
             os.remove(thumbnail_file)
+        if reservation:
+            reservation.release()
  
 
 async def split_and_upload_file(app, sender, file_path, caption):
@@ -436,34 +459,15 @@ async def split_and_upload_file(app, sender, file_path, caption):
 
     file_size = os.path.getsize(file_path)
     start = await app.send_message(sender, f"ℹ️ File size: {file_size / (1024 * 1024):.2f} MB")
-    PART_SIZE =  1.9 * 1024 * 1024 * 1024
-
-    part_number = 0
-    async with aiofiles.open(file_path, mode="rb") as f:
-        while True:
-            chunk = await f.read(PART_SIZE)
-            if not chunk:
-                break
-
-            # Create part filename
-            base_name, file_ext = os.path.splitext(file_path)
-            part_file = f"{base_name}.part{str(part_number).zfill(3)}{file_ext}"
-
-            # Write part to file
-            async with aiofiles.open(part_file, mode="wb") as part_f:
-                await part_f.write(chunk)
+    PART_SIZE = int(1.9 * 1024 * 1024 * 1024)
 
-            # Uploading part
-            edit = await app.send_message(sender, f"⬆️ Uploading part {part_number + 1}...")
-            part_caption = f"{caption} \n\n**Part : {part_number + 1}**"
-            await app.send_document(sender, document=part_file, caption=part_caption,
-                progress=progress_bar,
-                progress_args=("╭─────────────────────╮\n│      **__Pyro Uploader__**\n├─────────────────────", edit, time.time())
-            )
-            await edit.delete()
-            os.remove(part_file)  # Cleanup after upload
-
-            part_number += 1
+    # Parts are byte-range views of the original file, uploaded in parallel and delivered in order
+    await upload_split_parts(
+        app, file_path, PART_SIZE, sender, caption, LOG_GROUP,
+        workers=SPLIT_UPLOAD_WORKERS,
+        progress=progress_bar,
+        progress_header="╭─────────────────────╮\n│      **__Pyro Uploader__**\n├─────────────────────"
+    )
 
     await start.delete()
     os.remove(file_path)